@@ -1,20 +1,23 @@
 #!/usr/bin/env python3
 
 import argparse
-import csv
 import datetime
+import itertools
 import json
 import os
 import pathlib
-import re
-import requests
 import stat
 import sys
 import textwrap
+import threading
 import time
-import urllib3
 
+# Only modules which are needed by every request type, including --help, are imported here. Anything else, such as requests, is imported
+# by the method which needs it so that a single request or a bad argument isn't held up importing modules which it will never use.
 from core.ArgparseCustomFormatter import ArgparseCustomFormatter
+from core.CloudRFError import CloudRFAuthenticationError, CloudRFConnectionError, CloudRFError, CloudRFHttpError, CloudRFSslError
+from core.CloudRFRequest import CloudRFRequest
+from core.JsonSerializer import JsonSerializer
 from core.PythonValidator import PythonValidator
 
 class CloudRF:
@@ -23,22 +26,24 @@ class CloudRF:
     description = 'CloudRF'
     requestType = None
 
-    ALLOWED_REQUEST_TYPES = ['area', 'interference', 'mesh', 'multisite', 'network', 'path', 'points']
+    ALLOWED_REQUEST_TYPES = CloudRFRequest.REQUEST_TYPES
     CSV_REQUIRED_HEADERS_MULTISITE = ['lat', 'lon', 'alt', 'frq', 'txw', 'bwi', 'antenna.txg', 'antenna.txl', 'antenna.ant', 'antenna.azi', 'antenna.tlt', 'antenna.hbw', 'antenna.vbw', 'antenna.fbr', 'antenna.pol']
     CSV_REQUIRED_HEADERS_POINTS = ['lat', 'lon', 'alt']
     URL_GITHUB = 'https://github.com/Cloud-RF/CloudRF-API-clients'
 
-    def __init__(self, REQUEST_TYPE):
+    __printLock = threading.Lock()
+
+    def __init__(self, REQUEST_TYPE, ARGUMENTS = None):
         # Where was the script called from?
         self.calledFromPath = pathlib.Path(__file__).parent.resolve()
         self.requestType = REQUEST_TYPE
 
+        # Everything after the request type is passed to argparse
+        self.__commandLineArguments = sys.argv[2:] if ARGUMENTS is None else list(ARGUMENTS)
+
         PythonValidator.version()
         self.__validateRequestType()
 
-        # We use the first argument passed in to determine the type of request, but this conflicts with argparse, need to remove it
-        sys.argv.pop(1)
-
         self.__argparseInitialiser()
 
         # If we are in verbose mode then just output everything
@@ -48,36 +53,104 @@ class CloudRF:
 
         if not self.__arguments.strict_ssl:
             self.__verboseLog('Strict SSL disabled.')
+
+            import urllib3
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
         self.__validateApiKey()
+        self.__validateCache()
+        self.__validateCompression()
+        self.__validateConcurrency()
+        self.__validateConnectionPool()
+        self.__validateDownloadChunkSize()
         self.__validateFileAndDirectoryPermissions()
+        self.__validateJsonBackend()
+        self.__validateMaxPointsPerRequest()
+        self.__validateRateLimit()
+        self.__validateRetries()
+        self.__validateTimeout()
 
-        if self.requestType in ['area', 'multisite', 'path', 'points']:
-            self.__jsonTemplate = self.__validateJsonTemplate()
-            self.__csvInputList = self.__validateCsv()
+        self.__client = self.__createClient()
+        self.__responseCache = self.__createResponseCache()
 
-            if self.__arguments.input_csv and self.__csvInputList:
-                # For points/multisite requests the CSV input is handled differently to others
-                if self.requestType == 'points':
-                    newJsonData = self.__customiseJsonPointsFromCsv(templateJson = self.__jsonTemplate, csvListOfDictionaries = self.__csvInputList)
-                    self.__calculate(jsonData = newJsonData)
-                elif self.requestType == 'multisite':
-                    newJsonData = self.__customiseJsonMultisiteFromCsv(templateJson = self.__jsonTemplate, csvListOfDictionaries = self.__csvInputList)
-                    self.__calculate(jsonData = newJsonData)
-                else:
-                    # CSV has been used, run a request for each of the CSV rows
-                    for row in self.__csvInputList:
-                        # Adjust the input JSON template to meet the values which are found in the CSV row
-                        newJsonData = self.__customiseJsonFromCsvRow(templateJson = self.__jsonTemplate, csvRowDictionary = row)
+        import concurrent.futures
+
+        # Output files are downloaded in the background so that the next calculation can be made while they are retrieved
+        self.__downloadExecutor = concurrent.futures.ThreadPoolExecutor(max_workers = self.__arguments.download_concurrency)
+        self.__downloadFutures = []
+        self.__downloadFuturesLock = threading.Lock()
+
+        # Requests which fail are recorded and reported at the end rather than stopping the whole run
+        self.__failures = []
+        self.__failuresLock = threading.Lock()
+
+        # Only CSV batches of area/path requests are journaled
+        self.__journal = None
+
+        failureReportPath = None
+        stoppedEarly = True
+
+        try:
+            if self.requestType in ['area', 'multisite', 'path', 'points']:
+                self.__jsonTemplate = self.__validateJsonTemplate()
+                self.__validateCsv()
+
+                csvRows = self.__iterateCsv() if self.__arguments.input_csv else iter([])
+                firstCsvRow = next(csvRows, None)
+
+                if firstCsvRow is not None:
+                    csvRows = itertools.chain([firstCsvRow], csvRows)
+
+                    # For points/multisite requests the CSV input is handled differently to others
+                    if self.requestType in ['multisite', 'points'] and self.__arguments.max_points_per_request > 0:
+                        # Large CSVs are split into several smaller requests which are merged back together
+                        self.__calculateCsvChunks(csvRows = csvRows)
+                    elif self.requestType == 'points':
+                        newJsonData = self.__customiseJsonPointsFromCsv(templateJson = self.__jsonTemplate, csvListOfDictionaries = [row for lineNumber, row in csvRows])
                         self.__calculate(jsonData = newJsonData)
-            else:
-                # Just run a calculation based on the template
-                self.__calculate(jsonData = self.__jsonTemplate)
+                    elif self.requestType == 'multisite':
+                        newJsonData = self.__customiseJsonMultisiteFromCsv(templateJson = self.__jsonTemplate, csvListOfDictionaries = [row for lineNumber, row in csvRows])
+                        self.__calculate(jsonData = newJsonData)
+                    else:
+                        # CSV has been used, run a request for each of the CSV rows
+                        self.__calculateCsvRows(csvRows = csvRows)
+                else:
+                    # Just run a calculation based on the template
+                    self.__calculate(jsonData = self.__jsonTemplate)
+
+            elif self.requestType in ['interference', 'network', 'mesh']:
+                # Each of these do not use JSON data, instead they make use of parameters which are expected in argparse
+                self.__calculate(jsonData = None)
+
+            self.__waitForDownloads()
+            stoppedEarly = False
+        except BaseException:
+            self.__cancelDownloads()
+            raise
+        finally:
+            self.__downloadExecutor.shutdown(wait = True)
+            self.__client.close()
+
+            if self.__client.tracer:
+                self.__client.tracer.close()
+
+                for line in self.__client.tracer.summary():
+                    print(line)
+
+                print('Request timings saved at %s' % self.__arguments.trace_file)
+
+            if self.__responseCache:
+                self.__responseCache.prune()
+
+            # Also written when the batch is stopped part of the way through, so the failures recorded before then are not lost
+            if self.__failures:
+                failureReportPath = self.__saveFailureReport()
+
+                if stoppedEarly:
+                    print('Stopped with %d failed requests so far. A failure report has been saved at %s' % (len(self.__failures), failureReportPath))
 
-        elif self.requestType in ['interference', 'network', 'mesh']:
-            # Each of these do not use JSON data, instead they make use of parameters which are expected in argparse
-            self.__calculate(jsonData = None)
+        if failureReportPath:
+            sys.exit('Process completed with %d failed requests. A failure report has been saved at %s' % (len(self.__failures), failureReportPath))
 
         sys.exit('Process completed. Please check your output folder (%s)' % self.__arguments.output_directory)
 
@@ -99,8 +172,11 @@ class CloudRF:
                     requiredCsvHeaders = self.CSV_REQUIRED_HEADERS_MULTISITE
 
                 self.__parser.add_argument('-i', '--input-csv', dest = 'input_csv', required = True, help = 'Absolute path to input CSV of points to be used in your request. The CSV header row must be included with the keys of: %s' % requiredCsvHeaders)
+                self.__parser.add_argument('-mp', '--max-points-per-request', dest = 'max_points_per_request', type = int, default = 0, help = 'Maximum number of CSV rows to send in a single request. Larger CSVs are split into several requests which are sent with --concurrency. The results of points parts are merged back into a single file in CSV order, multisite parts are kept as separate coverages. Use 0 to send every row in one request.')
             else:
                 self.__parser.add_argument('-i', '--input-csv', dest = 'input_csv', help = 'Absolute path to input CSV, used in combination with --input-template to customise your template to a specific usecase. The CSV header row must be included. Header row values must be defined in dot notation format of the template key that they are to override in the template, for example transmitter latitude will be named as "transmitter.lat".')
+                self.__parser.add_argument('--journal', dest = 'journal', default = None, help = 'Absolute path to the journal file which records the progress of each CSV row. Defaults to journal.jsonl in the --output-directory.')
+                self.__parser.add_argument('--resume', dest = 'resume', default = False, action = 'store_true', help = 'Use the journal to skip CSV rows which have already been calculated, only downloading any of their output files which are missing.')
 
         if self.requestType in ['interference', 'mesh', 'network']:
             self.__parser.add_argument('-nn', '--network-name', dest = 'network_name', required = True, help = 'The name of the network which you wish to run the analysis on.')
@@ -127,11 +203,35 @@ class CloudRF:
         outputFileChoices = ['all'] + self.allowedOutputTypes if len(self.allowedOutputTypes) > 1 else self.allowedOutputTypes
         self.__parser.add_argument('-s', '--output-file-type', dest = 'output_file_type', choices = outputFileChoices, help = 'Type of file to be downloaded.', default = self.allowedOutputTypes[0])
         self.__parser.add_argument('-v', '--verbose', action="store_true", default = False, help = 'Output more information on screen. This is often useful when debugging.')
-        self.__parser.add_argument('-w', '--wait', dest = 'wait', default = 3, help = 'Time in seconds to wait before running the next calculation.')
+        self.__parser.add_argument('-c', '--concurrency', dest = 'concurrency', type = int, default = 1, help = 'Number of CSV rows to calculate at the same time. Only applies when an input CSV is used with area or path requests, or to the parts of a points or multisite CSV split with --max-points-per-request.')
+        self.__parser.add_argument('-dc', '--download-concurrency', dest = 'download_concurrency', type = int, default = 4, help = 'Number of output files to download at the same time. Downloads run in the background while the next calculation is made.')
+        self.__parser.add_argument('--pool-size', dest = 'pool_size', type = int, default = None, help = 'Maximum number of connections kept open to each host. Defaults to the larger of 10 and the combined --concurrency and --download-concurrency values.')
+        self.__parser.add_argument('--pool-hosts', dest = 'pool_hosts', type = int, default = 4, help = 'Number of hosts to keep a connection pool for, such as the CloudRF API service and the archive host.')
+        self.__parser.add_argument('--no-keep-alive', dest = 'keep_alive', action = 'store_false', default = True, help = 'Close the connection after every request rather than reusing it for the next request.')
+        self.__parser.add_argument('--download-chunk-size', dest = 'download_chunk_size', type = int, default = 1048576, help = 'Size in bytes of each chunk written to disk when downloading output files. Larger values use more memory per download.')
+        self.__parser.add_argument('-rl', '--rate-limit', dest = 'rate_limit', type = float, default = 1, help = 'Maximum number of calculations per second sent to the CloudRF API service, shared across all --concurrency workers. Fractional values are allowed, for example 0.5 is one calculation every 2 seconds. Use 0 for no limit.')
+        self.__parser.add_argument('-b', '--burst', dest = 'burst', type = int, default = 1, help = 'Number of calculations which can be sent at once before --rate-limit applies.')
+        self.__parser.add_argument('--max-retries', dest = 'max_retries', type = int, default = 3, help = 'Number of times to retry a request which fails with a HTTP 429, a HTTP 5xx or a connection error before it is recorded as failed.')
+        self.__parser.add_argument('--retry-backoff', dest = 'retry_backoff', type = float, default = 1, help = 'Base time in seconds to wait before retrying a failed request. This doubles with each attempt, with random jitter applied.')
+        self.__parser.add_argument('--retry-max-backoff', dest = 'retry_max_backoff', type = float, default = 60, help = 'Maximum time in seconds to wait before retrying a failed request.')
+        self.__parser.add_argument('--cache-directory', dest = 'cache_directory', default = None, help = 'Absolute directory path of a local cache of responses and output files. Identical area, multisite, path and points requests are served from the cache without calling the CloudRF API service. Caching is disabled when not set.')
+        self.__parser.add_argument('--cache-max-size', dest = 'cache_max_size', type = float, default = 1024, help = 'Maximum size of the cache in megabytes. The least recently used entries are removed first.')
+        self.__parser.add_argument('--cache-ttl', dest = 'cache_ttl', type = float, default = 86400, help = 'Time in seconds that a cached response is used for. Use 0 to never expire.')
+
+        # Only these request types send a JSON body which can be compressed
+        if self.requestType in ['area', 'multisite', 'path', 'points']:
+            self.__parser.add_argument('--compress', dest = 'compress', choices = ['gzip', 'zstd'], default = None, help = 'Compress request bodies with a Content-Encoding of gzip, or zstd which needs the zstandard module. Useful for large points and multisite requests sent over slow links. Request bodies are not compressed when not set.')
+            self.__parser.add_argument('--compress-threshold', dest = 'compress_threshold', type = int, default = 65536, help = 'Minimum size in bytes of a request body before it is compressed with --compress.')
+
+        self.__parser.add_argument('--json-backend', dest = 'json_backend', choices = JsonSerializer.BACKENDS, default = JsonSerializer.BACKEND_AUTO, help = 'Library used to encode requests and decode responses. The default of auto uses orjson when it is installed, which is much faster for large points, multisite and network requests.')
+        self.__parser.add_argument('--timeout', dest = 'timeout', type = float, default = None, help = 'Time in seconds to wait for the CloudRF API service to respond before the attempt is treated as a connection error and retried. By default there is no timeout.')
+        self.__parser.add_argument('--trace-file', dest = 'trace_file', default = None, help = 'Absolute path to a file which the timing of each calculation and output file download is appended to, split into phases such as waiting for the rate limit, connecting, uploading, the server calculating, downloading and writing to disk. Tracing is disabled when not set.')
+        self.__parser.add_argument('--trace-format', dest = 'trace_format', choices = ['jsonl', 'otlp'], default = 'jsonl', help = 'Format of the --trace-file. jsonl saves each request as a line of JSON, otlp saves each request as a line of OpenTelemetry OTLP/JSON.')
+        self.__parser.add_argument('-w', '--wait', dest = 'wait', type = float, default = None, help = 'Deprecated, please use --rate-limit instead. Time in seconds between calculations, the same as a --rate-limit of 1/WAIT.')
         
-        self.__arguments = self.__parser.parse_args()
+        self.__arguments = self.__parser.parse_args(self.__commandLineArguments)
 
-    def __calculate(self, jsonData):
+    def __calculate(self, jsonData, rowNumber = None, rowHash = None, partNumber = None):
         now = datetime.datetime.now()
 
         calculationName = self.requestType
@@ -140,14 +240,24 @@ class CloudRF:
         elif self.requestType in ['interference', 'mesh', 'network']:
             calculationName = self.__arguments.network_name
 
+        # Rows in a CSV batch can share a network/site name and finish in the same second, keep their outputs apart
+        if rowNumber is not None:
+            calculationName = calculationName + '_row' + str(rowNumber)
+
+        # As are the parts of a points/multisite CSV which has been split into several requests
+        if partNumber is not None:
+            calculationName = calculationName + '_part%03d' % partNumber
+
         requestName = now.strftime('%Y-%m-%d_%H%M%S_' + calculationName) 
         rawSaveBasePath = str(self.__arguments.output_directory).rstrip('/').rstrip('\\')
         saveBasePath = os.path.join(rawSaveBasePath, requestName)
 
-        self.__verboseLog('Waiting %d seconds...' % (int(self.__arguments.wait)))
-        time.sleep(int(self.__arguments.wait))
         self.__verboseLog('Running %s calculation: %s' % (self.requestType, requestName))
 
+        response = None
+        cacheKey = None
+        cachedResponseContent = None
+
         try:
             if jsonData:
                 fixedJsonData = self.__fixPotentiallyBrokenRequestJson(jsonData)
@@ -156,119 +266,316 @@ class CloudRF:
                 self.__verboseLog('Request JSON:')
                 self.__verboseLog(fixedJsonData)
 
-                response = requests.post(
-                    url = str(self.__arguments.base_url).rstrip('/') + '/' + self.requestType,
-                    headers = {
-                        'key': self.__arguments.api_key
-                    },
-                    json = fixedJsonData,
-                    verify = self.__arguments.strict_ssl
-                )
+                if self.__responseCache:
+                    from core.ResponseCache import ResponseCache
+                    cacheKey = ResponseCache.key(self.__client.calculationUrl(self.requestType), fixedJsonData)
+                    cachedResponseContent = self.__responseCache.getResponse(cacheKey)
+
+                # The CloudRF API service is only called when an identical request has not already been cached
+                if cachedResponseContent is None:
+                    response = self.__client.calculate(requestType = self.requestType, jsonData = fixedJsonData)
 
                 if self.__arguments.save_raw_request:
                     saveJsonRequestPath = saveBasePath + '.request.json'
                     with open(saveJsonRequestPath, 'w') as rawRequestFile:
                         rawRequestFile.write(json.dumps(fixedJsonData, indent = 4))
-                    print('Raw request saved at %s' % saveJsonRequestPath)
+                    self.__log('Raw request saved at %s' % saveJsonRequestPath)
             elif self.requestType == 'interference':
-                fixedJsonData = {
-                    'name': requestName,
-                    's_network': self.__arguments.network_name,
-                    'j_network': self.__arguments.jammer_network_name,
-                    'colour_key': 'JS.dB'
-                }
-
-                response = requests.post(
-                    url = str(self.__arguments.base_url).rstrip('/') + '/' + self.requestType,
-                    headers = {
-                        'key': self.__arguments.api_key
-                    },
-                    json = fixedJsonData,
-                    verify = self.__arguments.strict_ssl
-                )
+                request = CloudRFRequest.interference(networkName = self.__arguments.network_name, jammerNetworkName = self.__arguments.jammer_network_name, name = requestName)
+                response = self.__client.calculate(requestType = self.requestType, jsonData = request.jsonData)
             elif self.requestType in ['network', 'mesh']:
                 # Other requests use params rather than a JSON body
-                requestParams = {}
-
                 if self.requestType == 'network':
-                    requestParams['net'] = self.__arguments.network_name
-                    requestParams['lat'] = self.__arguments.latitude
-                    requestParams['lon'] = self.__arguments.longitude
-                    requestParams['rxh'] = self.__arguments.altitude
-                elif self.requestType in ['mesh']:
-                    requestParams['network'] = self.__arguments.network_name
-
-                response = requests.post(
-                    url = str(self.__arguments.base_url).rstrip('/') + '/' + self.requestType,
-                    headers = {
-                        'key': self.__arguments.api_key
-                    },
-                    params = requestParams,
-                    verify = self.__arguments.strict_ssl
-                )
-
-            if self.__arguments.save_raw_request:
-                saveRequestPath = saveBasePath + '.request.txt'
-                with open(saveRequestPath, 'w') as rawRequestFile:
-                    rawRequestFile.write(response.request.url)
-                print('Raw request saved at %s' % saveRequestPath)
-
-            self.__verboseLog('Raw response:')
-            self.__verboseLog(response.text)
-
-            self.__checkHttpResponse(httpStatusCode = response.status_code, httpRawResponse = response.text)
-            self.__saveOutputFileTypes(httpRawResponse = response.text, saveBasePath = saveBasePath)
+                    request = CloudRFRequest.network(networkName = self.__arguments.network_name, latitude = self.__arguments.latitude, longitude = self.__arguments.longitude, altitude = self.__arguments.altitude)
+                else:
+                    request = CloudRFRequest.mesh(networkName = self.__arguments.network_name)
+
+                response = self.__client.calculate(requestType = self.requestType, params = request.params)
+
+            if response is not None:
+                if self.__arguments.save_raw_request:
+                    saveRequestPath = saveBasePath + '.request.txt'
+                    with open(saveRequestPath, 'w') as rawRequestFile:
+                        rawRequestFile.write(response.request.url)
+                    self.__log('Raw request saved at %s' % saveRequestPath)
+
+                # Large responses are only decoded to text when they are going to be shown
+                if self.__arguments.verbose:
+                    self.__verboseLog('Raw response:')
+                    self.__verboseLog(response.text)
+
+                if response.status_code != 200:
+                    self.__checkHttpResponse(httpStatusCode = response.status_code, httpRawResponse = response.text)
+
+                responseContent = response.content
+            else:
+                self.__verboseLog('Using cached response for %s.' % requestName)
+                responseContent = cachedResponseContent
+
+            # Parse the response bytes once, it is shared by the journal and every output file type which is retrieved
+            try:
+                responseJson = JsonSerializer.loads(responseContent)
+            except ValueError:
+                # Such as an error page from a proxy, which is reported as a failure of this row in the same way as CloudRFClient.run
+                raise CloudRFHttpError('The CloudRF API service responded with a HTTP 200 which is not valid JSON.', statusCode = 200, responseText = responseContent.decode('utf-8', errors = 'replace'))
+
+            # Only responses which could be parsed are cached, so a broken response is never served again by a later run
+            if cacheKey and response is not None:
+                self.__responseCache.storeResponse(cacheKey = cacheKey, url = self.__client.calculationUrl(self.requestType), responseContent = responseContent)
+
+            if rowHash:
+                self.__journal.recordCalculated(rowHash = rowHash, rowNumber = rowNumber, requestName = requestName, saveBasePath = saveBasePath, response = responseJson)
+
+            self.__saveOutputFileTypes(responseJson = responseJson, saveBasePath = saveBasePath, rowNumber = rowNumber, requestName = requestName, rowHash = rowHash, cacheKey = cacheKey)
 
             if self.__arguments.save_raw_response:
                 saveJsonResponsePath = saveBasePath + '.response.json'
-                with open(saveJsonResponsePath, 'w') as rawResponseFile:
-                    rawResponseFile.write(response.text)
+                with open(saveJsonResponsePath, 'wb') as rawResponseFile:
+                    rawResponseFile.write(responseContent)
 
-                print('Raw response saved at %s' % saveJsonResponsePath)
+                self.__log('Raw response saved at %s' % saveJsonResponsePath)
 
-        except requests.exceptions.SSLError:
+            return responseJson
+        except CloudRFSslError:
             sys.exit('SSL error occurred. This is common with self-signed certificates. You can try disabling SSL verification with --no-strict-ssl.')
-        except requests.exceptions.ConnectionError:
-            sys.exit('Unable to connect to CloudRF API service at %s. Please check your network settings, or if you are trying to use a custom endpoint please use the --base-url flag.' % self.__arguments.base_url)
+        except CloudRFError as e:
+            if isinstance(e, CloudRFConnectionError):
+                self.__log('Unable to connect to CloudRF API service at %s. Please check your network settings, or if you are trying to use a custom endpoint please use the --base-url flag.' % self.__arguments.base_url)
+
+            self.__recordFailure(rowNumber = rowNumber, requestName = requestName, stage = 'calculation', error = e)
+
+            if rowHash:
+                self.__journal.recordFailed(rowHash = rowHash, rowNumber = rowNumber, requestName = requestName, message = str(e))
+
+    def __calculateCsvChunk(self, partNumber, transmitterCsvRow, csvListOfDictionaries, partResponses):
+        # The template is never changed in place, so concurrent parts can share it without leaking points into each other
+        if self.requestType == 'points':
+            newJsonData = self.__customiseJsonPointsFromCsv(templateJson = self.__jsonTemplate, csvListOfDictionaries = csvListOfDictionaries, transmitterCsvRow = transmitterCsvRow)
+        else:
+            newJsonData = self.__customiseJsonMultisiteFromCsv(templateJson = self.__jsonTemplate, csvListOfDictionaries = csvListOfDictionaries)
+
+        partResponses[partNumber] = self.__calculate(jsonData = newJsonData, partNumber = partNumber)
+
+    def __calculateCsvChunks(self, csvRows):
+        startTime = time.perf_counter()
+        maximumPoints = self.__arguments.max_points_per_request
+
+        csvRows = (row for lineNumber, row in csvRows)
+
+        # The transmitter of a points request is always the very first row of the CSV, not the first row of each part
+        firstCsvRow = next(csvRows)
+        csvRows = itertools.chain([firstCsvRow], csvRows)
+
+        # Parts are only read from the CSV as workers become free, in the same way as area/path rows
+        chunks = iter(lambda: list(itertools.islice(csvRows, maximumPoints)), [])
+        partResponses = {}
+
+        self.__verboseLog('Splitting CSV into parts of up to %d rows with a concurrency of %d.' % (maximumPoints, self.__arguments.concurrency))
+
+        partCount = self.__runConcurrently(function = self.__calculateCsvChunk, argumentsIterable = (
+            (partNumber, firstCsvRow, chunk, partResponses) for partNumber, chunk in enumerate(chunks, start = 1)
+        ))
+
+        self.__waitForDownloads()
+
+        elapsedSeconds = time.perf_counter() - startTime
+        print('Completed %d parts in %.2f seconds.' % (partCount, elapsedSeconds))
+
+        failedPartNumbers = [partNumber for partNumber in range(1, partCount + 1) if partResponses.get(partNumber) is None]
+
+        if failedPartNumbers:
+            print('Not merging results as %d of %d parts failed: %s' % (len(failedPartNumbers), partCount, ', '.join(str(partNumber) for partNumber in failedPartNumbers)))
+            return
+
+        # Each part of a multisite CSV is its own coverage, which cannot be merged into one, so its output files are kept as they are
+        if self.requestType == 'multisite':
+            print('Not merging results as multisite parts are separate coverages, the output files of each part are saved with its part number.')
+            return
+
+        # Transmitters are merged in the same order as the CSV, the rest of each response is kept alongside under its part
+        mergedResponse = {'Transmitters': [], 'parts': []}
+
+        for partNumber in range(1, partCount + 1):
+            partResponse = dict(partResponses[partNumber])
+
+            # Each part numbers its servers from 1, so they are numbered again to match their row in the whole CSV
+            for transmitter in partResponse.pop('Transmitters', []):
+                if 'server' in transmitter:
+                    transmitter = dict(transmitter, server = len(mergedResponse['Transmitters']) + 1)
+
+                mergedResponse['Transmitters'].append(transmitter)
+
+            mergedResponse['parts'].append(partResponse)
+
+        calculationName = self.requestType
+        if 'network' in self.__jsonTemplate and 'site' in self.__jsonTemplate:
+            calculationName = self.__jsonTemplate['network'] + '_' + self.__jsonTemplate['site']
+
+        mergedPath = os.path.join(str(self.__arguments.output_directory).rstrip('/').rstrip('\\'), datetime.datetime.now().strftime('%Y-%m-%d_%H%M%S_' + calculationName) + '.merged.json')
+
+        with open(mergedPath, 'w') as mergedFile:
+            mergedFile.write(json.dumps(mergedResponse, indent = 4))
+
+        print('Merged %d transmitters from %d parts saved at %s' % (len(mergedResponse['Transmitters']), partCount, mergedPath))
+
+    def __calculateCsvRow(self, rowNumber, csvRowDictionary):
+        from core.BatchJournal import BatchJournal
+
+        # Adjust the input JSON template to meet the values which are found in the CSV row, only the parts of the template which the row changes are copied
+        newJsonData = self.__templatePatcher.apply(csvRowDictionary)
+        rowHash = BatchJournal.rowHash(self.requestType, newJsonData)
+
+        if self.__arguments.resume:
+            journalEntry = self.__journal.get(rowHash)
+
+            if journalEntry and journalEntry['status'] == BatchJournal.STATUS_CALCULATED:
+                # Only the output files which are not already on disk need to be downloaded again
+                completedFileTypes = [
+                    fileType for fileType, paths in journalEntry['artifacts'].items()
+                    if paths and all(os.path.exists(path) for path in paths)
+                ]
+
+                self.__verboseLog('Row %d has already been calculated as %s, skipping calculation.' % (rowNumber, journalEntry['request_name']))
+                self.__saveOutputFileTypes(responseJson = journalEntry['response'], saveBasePath = journalEntry['save_base_path'], rowNumber = rowNumber, requestName = journalEntry['request_name'], rowHash = rowHash, completedFileTypes = completedFileTypes)
+                return
+
+        self.__calculate(jsonData = newJsonData, rowNumber = rowNumber, rowHash = rowHash)
+
+    def __calculateCsvRows(self, csvRows):
+        from core.BatchJournal import BatchJournal
+
+        startTime = time.perf_counter()
+
+        journalPath = self.__arguments.journal if self.__arguments.journal else os.path.join(str(self.__arguments.output_directory).rstrip('/').rstrip('\\'), 'journal.jsonl')
+        self.__journal = BatchJournal(journalPath)
+
+        if self.__arguments.resume:
+            print('Resuming from journal (%s) with %d previously seen rows.' % (journalPath, len(self.__journal)))
+        else:
+            self.__verboseLog('Recording progress to journal (%s).' % journalPath)
+
+        if self.__arguments.concurrency > 1:
+            self.__verboseLog('Running CSV rows with a concurrency of %d.' % self.__arguments.concurrency)
+
+        rowCount = self.__runConcurrently(function = self.__calculateCsvRow, argumentsIterable = (
+            (rowNumber, row) for rowNumber, (lineNumber, row) in enumerate(csvRows, start = 1)
+        ))
+
+        # Throughput should include the output files of each row, not just the calculations
+        self.__waitForDownloads()
+
+        elapsedSeconds = time.perf_counter() - startTime
+        print('Completed %d CSV rows in %.2f seconds (%.2f rows/s).' % (rowCount, elapsedSeconds, rowCount / elapsedSeconds if elapsedSeconds > 0 else 0))
+
+    def __cancelDownloads(self):
+        # Downloads which have not started yet are dropped, downloads in flight are left to finish
+        with self.__downloadFuturesLock:
+            for future in self.__downloadFutures:
+                future.cancel()
 
     def __checkHttpResponse(self, httpStatusCode, httpRawResponse):
-        if httpStatusCode != 200:
-            print('An HTTP %d error occurred with your request. Full response from the CloudRF API is listed below.' % httpStatusCode)
-            print(httpRawResponse)
-
-            if httpStatusCode == 400:
-                sys.exit('HTTP 400 refers to a bad request. You likely have bad values in your input JSON/CSV. For good examples please consult %s' % self.URL_GITHUB)
-            elif httpStatusCode == 401:
-                sys.exit('HTTP 401 refers to an unauthorised request. Your API key is likely incorrect.')
-            elif httpStatusCode == 403:
-                sys.exit('HTTP 403 refers to a forbidden request. Your API key appears to be correct but you do not appear to have permission to make your request.')
-            elif httpStatusCode == 500:
-                sys.exit('HTTP 500 refers to an issue with the server. A problem with the CloudRF API service appears to have occurred.')
-            else:
-                sys.exit('An unknown HTTP error has occured. Please consult the above response from the CloudRF API, or %s' % self.URL_GITHUB)
-
-    def __customiseJsonFromCsvRow(self, templateJson, csvRowDictionary):
-        for key, value in csvRowDictionary.items():
-            # We are using dot notation so split out on this
-            parts = str(key).split('.')
-
-            # Should be a maxium of 2 parts so we can just be explicit here and update the template JSON
-            if len(parts) == 2:
-                templateJson[parts[0]][parts[1]] = value
-            elif len(parts) == 1:
-                templateJson[key] = value
-            else:
-                sys.exit('Maximum depth of dot notation 2. Please check your input CSV.')
-        
-        return templateJson
-    
+        try:
+            self.__client.checkResponse(statusCode = httpStatusCode, responseText = httpRawResponse)
+        except CloudRFHttpError as e:
+            # Rows may fail in several threads at once, so each report is logged as one message to keep it in one piece
+            report = [
+                'An HTTP %d error occurred with your request. Full response from the CloudRF API is listed below.' % httpStatusCode,
+                httpRawResponse
+            ]
+
+            # Authentication problems will affect every request, so there is no point carrying on
+            if isinstance(e, CloudRFAuthenticationError):
+                self.__log('\n'.join(report))
+                sys.exit(str(e))
+
+            report.append(str(e))
+
+            if httpStatusCode == 429:
+                report.append('Please consider lowering --rate-limit.')
+            elif httpStatusCode < 500:
+                report.append('For good examples please consult %s' % self.URL_GITHUB)
+
+            self.__log('\n'.join(report))
+
+            raise
+
+    def __createClient(self):
+        from core.CloudRFClient import CloudRFClient
+
+        if self.__arguments.wait is not None:
+            print('The --wait flag is deprecated, please use --rate-limit instead.')
+            rate = 1 / self.__arguments.wait if self.__arguments.wait > 0 else 0
+        else:
+            rate = self.__arguments.rate_limit
+
+        if rate > 0:
+            self.__verboseLog('Limiting calculations to %g per second with a burst of %d.' % (rate, self.__arguments.burst))
+        else:
+            self.__verboseLog('Calculations are not rate limited.')
+
+        # One client is shared by every request so that TCP and TLS connections are reused rather than opened for each calculation and download
+        poolSize = self.__arguments.pool_size if self.__arguments.pool_size else max(10, self.__arguments.concurrency + self.__arguments.download_concurrency)
+        self.__verboseLog('Using a connection pool of %d connections per host across %d hosts.' % (poolSize, self.__arguments.pool_hosts))
+
+        if not self.__arguments.keep_alive:
+            self.__verboseLog('Keep-alive disabled, connections will be closed after each request.')
+
+        tracer = None
+
+        if self.__arguments.trace_file:
+            from core.RequestTracer import RequestTracer
+
+            try:
+                tracer = RequestTracer(path = self.__arguments.trace_file, format = self.__arguments.trace_format)
+            except OSError as e:
+                sys.exit('Your trace file (%s) could not be opened: %s' % (self.__arguments.trace_file, e))
+
+            self.__verboseLog('Saving request timings to %s in %s format.' % (self.__arguments.trace_file, self.__arguments.trace_format))
+
+        return CloudRFClient(
+            apiKey = self.__arguments.api_key,
+            baseUrl = self.__arguments.base_url,
+            strictSsl = self.__arguments.strict_ssl,
+            rateLimit = rate,
+            burst = self.__arguments.burst,
+            maxRetries = self.__arguments.max_retries,
+            retryBackoff = self.__arguments.retry_backoff,
+            retryMaxBackoff = self.__arguments.retry_max_backoff,
+            poolSize = poolSize,
+            poolHosts = self.__arguments.pool_hosts,
+            keepAlive = self.__arguments.keep_alive,
+            downloadChunkSize = self.__arguments.download_chunk_size,
+            timeout = self.__arguments.timeout,
+            compression = getattr(self.__arguments, 'compress', None),
+            compressionThreshold = getattr(self.__arguments, 'compress_threshold', 0),
+            tracer = tracer,
+            log = self.__log,
+            verboseLog = self.__verboseLog
+        )
+
+    def __createResponseCache(self):
+        if not self.__arguments.cache_directory:
+            return None
+
+        self.__verboseLog('Using response cache (%s) of up to %g MB.' % (self.__arguments.cache_directory, self.__arguments.cache_max_size))
+
+        from core.ResponseCache import ResponseCache
+
+        responseCache = ResponseCache(
+            directory = self.__arguments.cache_directory,
+            maxSizeBytes = self.__arguments.cache_max_size * 1024 * 1024,
+            ttlSeconds = self.__arguments.cache_ttl
+        )
+        responseCache.prune()
+
+        return responseCache
+
     def __customiseJsonMultisiteFromCsv(self, templateJson, csvListOfDictionaries):
         # This is only for multisite requests
         if self.requestType != 'multisite':
             sys.exit('Unable to customise JSON points when request type is not "multisite".')
 
-        # All of the points are in an array/list, initialise it
-        templateJson['transmitters'] = []
+        transmitters = []
 
         for row in csvListOfDictionaries:
             transmitter = {
@@ -290,21 +597,17 @@ class CloudRF:
                     'pol': row['antenna.pol']
                 }
             }
-            templateJson['transmitters'].append(transmitter)
+            transmitters.append(transmitter)
 
-        return templateJson
+        # The template is shared, the builder makes a new request rather than changing the template in place
+        return CloudRFRequest.multisite(templateJson = templateJson, transmitters = transmitters).jsonData
 
-    def __customiseJsonPointsFromCsv(self, templateJson, csvListOfDictionaries):
+    def __customiseJsonPointsFromCsv(self, templateJson, csvListOfDictionaries, transmitterCsvRow = None):
         # This is only for points requests
         if self.requestType != 'points':
             sys.exit('Unable to customise JSON points when request type is not "points".')
 
-        # The transmitter location should be the very first point
-        templateJson['transmitter']['lat'] = csvListOfDictionaries[0]['lat']
-        templateJson['transmitter']['lon'] = csvListOfDictionaries[0]['lon']
-
-        # All of the points are in an array/list, initialise it
-        templateJson['points'] = []
+        points = []
 
         for row in csvListOfDictionaries:
             point = {
@@ -312,148 +615,165 @@ class CloudRF:
                 'lon': row['lon'],
                 'alt': row['alt']
             }
-            templateJson['points'].append(point)
+            points.append(point)
+
+        # The transmitter location should be the very first point, the builder makes a new request rather than changing the template in place
+        return CloudRFRequest.points(templateJson = templateJson, points = points, transmitter = transmitterCsvRow).jsonData
 
-        return templateJson
-    
     def __fixPotentiallyBrokenRequestJson(self, jsonData):
         if self.requestType == 'area':
-            if jsonData['receiver']['lat'] != 0:
-                print('Your template has a value in the receiver.lat key which will prevent an area calculation. Setting a safe default.')
-                jsonData['receiver']['lat'] = 0
+            request = CloudRFRequest.area(templateJson = jsonData)
+
+            for warning in request.warnings:
+                self.__log(warning)
 
-            if jsonData['receiver']['lon'] != 0:
-                print('Your template has a value in the receiver.lon key which will prevent an area calculation. Setting a safe default.')
-                jsonData['receiver']['lon'] = 0
+            return request.jsonData
 
         return jsonData
-    
-    def __retrieveOutputFile(self, httpRawResponse, fileType, saveBasePath):
-        self.__verboseLog('Retrieving output file: %s' % fileType)
 
-        responseJson = json.loads(httpRawResponse)
+    def __iterateCsv(self):
+        import csv
 
-        if self.requestType == 'area':
-            if fileType == 'png':
-                # PNG links exist already in the response JSON so we can just grab them from there
-                #pngPath3857 = saveBasePath + '.3857.png'
-                #self.__streamUrlToFile(responseJson['PNG_Mercator'], pngPath3857)
-                #self.__verboseLog('3857 projected PNG saved to %s' % pngPath3857)
-                pngPath4326 = saveBasePath + '.4326.png'
-                self.__streamUrlToFile(responseJson['PNG_WGS84'], pngPath4326)
-                self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
-            elif fileType == 'url':
-                txtPath = saveBasePath + '.url'
-                with open(txtPath, 'a') as txtOutputFile:
-                    txtOutputFile.write(self.__arguments.base_url.rstrip('/') + '/archive/calc?id=' + responseJson['sid'])
-                txtOutputFile.close()
-                self.__verboseLog('URL saved to %s' % txtPath)
-            else:
-                # Anything else we just pull out of the archive
-                savePath = saveBasePath + '.' + fileType
-                self.__streamUrlToFile(
-                    requestUrl = str(self.__arguments.base_url).rstrip('/') + '/archive/' + responseJson['sid'] + '/' + fileType,
-                    savePath = savePath
-                )
-                self.__verboseLog('%s file saved to %s' % (fileType, savePath))
-        
-        elif self.requestType == 'interference':
-            if fileType == 'png':
-                # PNG links exist already in the response JSON so we can just grab them from there
-                pngPath3857 = saveBasePath + '.3857.png'
-                self.__streamUrlToFile(responseJson['PNG_Mercator'], pngPath3857)
-                self.__verboseLog('3857 projected PNG saved to %s' % pngPath3857)
-                pngPath4326 = saveBasePath + '.4326.png'
-                self.__streamUrlToFile(responseJson['PNG_WGS84'], pngPath4326)
-                self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
-        
-        elif self.requestType == 'mesh':
-            if fileType == 'png':
-                # PNG links exist already in the response JSON so we can just grab them from there
-                pngPath3857 = saveBasePath + '.3857.png'
-                self.__streamUrlToFile(responseJson['png_mercator'], pngPath3857)
-                self.__verboseLog('3857 projected PNG saved to %s' % pngPath3857)
-                pngPath4326 = saveBasePath + '.4326.png'
-                self.__streamUrlToFile(responseJson['png_wgs84'], pngPath4326)
-                self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
-            if fileType == 'kmz':
-                kmzPath = saveBasePath + '.kmz'
-                self.__streamUrlToFile(responseJson['kmz'], kmzPath)
-                self.__verboseLog('Mesh KMZ saved to %s' % kmzPath)
-        
-        elif self.requestType == 'multisite':
-            if fileType == 'png':
-                # PNG links exist already in the response JSON so we can just grab them from there
-                pngPath4326 = saveBasePath + '.4326.png'
-                self.__streamUrlToFile(responseJson['PNG_WGS84'], pngPath4326)
-                self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
-        
-        elif self.requestType == 'network':
-            # Network returns an array of responses
-            if fileType == 'txt':
-                txtPath = saveBasePath + '.txt'
-                count = 1
-                with open(txtPath, 'a') as txtOutputFile:
-                    for row in responseJson:
-                        txtOutputFile.write('Site %d (%s, %s): %s dBm\n' % (
-                                                                        count, 
-                                                                        row['Transmitters'][0]['Latitude'],
-                                                                        row['Transmitters'][0]['Longitude'],
-                                                                        row['Transmitters'][0]['Signal power at receiver dBm'],
-                                                                      )
-                                                                    )
-                        count += 1
-                txtOutputFile.close()
-                self.__verboseLog('TXT saved to %s' % txtPath)
-
-        elif self.requestType == 'path':
-            if fileType == 'png':
-                pngPath = saveBasePath + '.png'
-                self.__streamUrlToFile(responseJson['Chart image'], pngPath)
-                self.__verboseLog('Path profile PNG saved to %s' % pngPath)
-            if fileType == 'kmz':
-                kmzPath = saveBasePath + '.kmz'
-                self.__streamUrlToFile(responseJson['kmz'], kmzPath)
-                self.__verboseLog('Path profile KMZ saved to %s' % kmzPath)
-        
-        elif self.requestType == 'points':
-            if fileType == 'kmz':
-                kmzPath = saveBasePath + '.kmz'
-                self.__streamUrlToFile(responseJson['kmz'], kmzPath)
-                self.__verboseLog('Points KMZ saved to %s' % kmzPath)
-        
+        # Rows are checked and handed out one at a time as they are read, so requests can start before the whole CSV has been read
+        try:
+            csvInputFile = open(self.__arguments.input_csv, 'r', newline = '')
+        except PermissionError:
+            sys.exit('Permission error when trying to read input CSV file (%s)' % self.__arguments.input_csv)
+
+        with csvInputFile:
+            reader = csv.DictReader(csvInputFile)
+
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    sys.exit('Unable to read line %d of the input CSV file (%s): %s' % (reader.line_num, self.__arguments.input_csv, e))
+
+                for key, value in row.items():
+                    if not key or not value:
+                        sys.exit('There is an empty header or value on line %d of the input CSV file (%s)' % (reader.line_num, self.__arguments.input_csv))
+
+                yield reader.line_num, row
+
+    def __log(self, message):
+        # Rows and downloads may be logging from several threads at once, keep each message on its own line
+        with self.__printLock:
+            print(message)
+
+    def __recordFailure(self, rowNumber, requestName, stage, error):
+        with self.__failuresLock:
+            self.__failures.append({
+                'row': rowNumber if rowNumber is not None else '',
+                'request_name': requestName,
+                'stage': stage,
+                'http_status_code': getattr(error, 'statusCode', ''),
+                'message': str(error)
+            })
+
+    def __retrieveOutputFileInBackground(self, responseJson, fileType, saveBasePath, rowNumber, requestName, rowHash, cacheKey):
+        import requests
+
+        try:
+            savedPaths = None
+
+            if cacheKey:
+                savedPaths = self.__responseCache.restoreArtifact(cacheKey = cacheKey, fileType = fileType, saveBasePath = saveBasePath)
+
+                if savedPaths is not None:
+                    self.__verboseLog('%s file restored from cache to %s' % (fileType, savedPaths))
+
+            if savedPaths is None:
+                savedPaths = self.__client.downloadOutputFile(requestType = self.requestType, responseJson = responseJson, fileType = fileType, saveBasePath = saveBasePath)
+
+                if cacheKey:
+                    self.__responseCache.storeArtifact(cacheKey = cacheKey, fileType = fileType, saveBasePath = saveBasePath, savedPaths = savedPaths)
+
+            if rowHash:
+                self.__journal.recordArtifact(rowHash = rowHash, fileType = fileType, paths = savedPaths)
+        except CloudRFSslError:
+            sys.exit('SSL error occurred when retrieving your %s file. This is common with self-signed certificates. You can try disabling SSL verification with --no-strict-ssl.' % fileType)
+        except (CloudRFError, requests.exceptions.RequestException) as e:
+            if isinstance(e, CloudRFHttpError):
+                self.__log('An HTTP %d error occurred when trying to retrieve your %s file from the CloudRF API. Skipping file download. Full response is listed below.\n%s' % (e.statusCode, fileType, e.responseText))
+
+            self.__log('Unable to retrieve your %s file for %s: %s' % (fileType, requestName, e))
+            self.__recordFailure(rowNumber = rowNumber, requestName = requestName, stage = '%s download' % fileType, error = e)
+
+    def __runConcurrently(self, function, argumentsIterable):
+        import concurrent.futures
+
+        # Call the function for each set of arguments using up to --concurrency workers, returns the number of calls made
+        callCount = 0
+
+        if self.__arguments.concurrency > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers = self.__arguments.concurrency) as executor:
+                # Arguments are only taken from the iterable as workers become free, so the whole CSV is never held in memory
+                maximumQueuedCalls = self.__arguments.concurrency * 2
+                futures = set()
+
+                try:
+                    for arguments in argumentsIterable:
+                        if len(futures) >= maximumQueuedCalls:
+                            completedFutures, futures = concurrent.futures.wait(futures, return_when = concurrent.futures.FIRST_COMPLETED)
+
+                            for future in completedFutures:
+                                future.result()
+
+                        futures.add(executor.submit(function, *arguments))
+                        callCount += 1
+
+                    for future in concurrent.futures.as_completed(futures):
+                        future.result()
+                except BaseException:
+                    # A fatal error in one call stops the batch, calls which have not started yet are dropped and calls in flight are left to finish
+                    for future in futures:
+                        future.cancel()
+                    raise
         else:
-            sys.exit('Unable to retrieve output file of unsupported request type.')
-    
-    def __saveOutputFileTypes(self, httpRawResponse, saveBasePath):
+            for arguments in argumentsIterable:
+                function(*arguments)
+                callCount += 1
+
+        return callCount
+
+    def __saveFailureReport(self):
+        import csv
+
+        failureReportPath = os.path.join(str(self.__arguments.output_directory).rstrip('/').rstrip('\\'), datetime.datetime.now().strftime('%Y-%m-%d_%H%M%S_failures.csv'))
+
+        # Rows which are still running when a batch is stopped may be adding failures of their own
+        with self.__failuresLock:
+            failures = sorted(self.__failures, key = lambda failure: (failure['row'] == '', failure['row'] or 0))
+
+        with open(failureReportPath, 'w', newline = '') as failureReportFile:
+            writer = csv.DictWriter(failureReportFile, fieldnames = ['row', 'request_name', 'stage', 'http_status_code', 'message'])
+            writer.writeheader()
+            writer.writerows(failures)
+
+        return failureReportPath
+
+    def __saveOutputFileTypes(self, responseJson, saveBasePath, rowNumber, requestName, rowHash = None, completedFileTypes = None, cacheKey = None):
         if self.__arguments.output_file_type == 'all':
             # Get all of the available file types for this request
-            for type in self.allowedOutputTypes:
-                self.__retrieveOutputFile(httpRawResponse = httpRawResponse, fileType = type, saveBasePath = saveBasePath)
+            fileTypes = self.allowedOutputTypes
         else:
-            self.__retrieveOutputFile(httpRawResponse = httpRawResponse, fileType = self.__arguments.output_file_type, saveBasePath = saveBasePath)
-
-    def __streamUrlToFile(self, requestUrl, savePath):
-        response = requests.get(requestUrl, stream = True, verify = self.__arguments.strict_ssl)
-
-        if response.status_code != 200:
-            print('An HTTP %d error occurred when trying to retrieve your file (%s) from the CloudRF API. Skipping file download. Full response is listed below.' % (response.status_code, requestUrl))
-            print(response.text)
-            return
+            fileTypes = [self.__arguments.output_file_type]
 
-        # If we are retrieving a stream
-        if response.headers.get('Content-Disposition'):
-            # The file extension may be different on the server side, so we should use that by default
-            serverFilename = re.findall("filename=(.+)", response.headers.get('Content-Disposition'))[0]
-            serverFilename = serverFilename.replace('"', '')
-            serverFileExtension = serverFilename.split('.', 1)[1]
+        if completedFileTypes:
+            fileTypes = [fileType for fileType in fileTypes if fileType not in completedFileTypes]
 
-            savePathBaseFilename = savePath.split('.', 1)[0]
-            savePath = savePathBaseFilename + '.' + serverFileExtension
+        # Each file type is retrieved at the same time, and without holding up the next calculation
+        with self.__downloadFuturesLock:
+            # Successful downloads are forgotten so that a long batch doesn't hold on to every download it has made
+            self.__downloadFutures = [
+                future for future in self.__downloadFutures
+                if not future.done() or (not future.cancelled() and future.exception() is not None)
+            ]
 
-        with open(savePath, 'wb') as outputFile:
-            outputFile.write(response.content)
-        del response
+            for fileType in fileTypes:
+                self.__downloadFutures.append(self.__downloadExecutor.submit(self.__retrieveOutputFileInBackground, responseJson, fileType, saveBasePath, rowNumber, requestName, rowHash, cacheKey))
 
     def __validateApiKey(self):
         parts = str(self.__arguments.api_key).split('-')
@@ -468,47 +788,84 @@ class CloudRF:
         if len(parts[1]) != 40:
             sys.exit('Your API key token component (part after "-") appears to be incorrect. %s' % externalPrompt)
 
+    def __validateCache(self):
+        if self.__arguments.cache_max_size < 0:
+            sys.exit('Your cache max size value (%g) must be 0 or greater.' % self.__arguments.cache_max_size)
+
+        if self.__arguments.cache_ttl < 0:
+            sys.exit('Your cache TTL value (%g) must be 0 or greater.' % self.__arguments.cache_ttl)
+
+    def __validateCompression(self):
+        if not hasattr(self.__arguments, 'compress'):
+            return
+
+        if self.__arguments.compress_threshold < 0:
+            sys.exit('Your compress threshold value (%d) must be 0 or greater.' % self.__arguments.compress_threshold)
+
+        if self.__arguments.compress == 'zstd':
+            import importlib.util
+
+            if importlib.util.find_spec('zstandard') is None:
+                sys.exit('zstd compression was asked for, but zstandard is not installed. Please install it with "pip install zstandard".')
+
+        if self.__arguments.compress:
+            self.__verboseLog('Compressing request bodies of %d bytes or more with %s.' % (self.__arguments.compress_threshold, self.__arguments.compress))
+
+    def __validateConcurrency(self):
+        if self.__arguments.concurrency < 1:
+            sys.exit('Your concurrency value (%d) must be 1 or greater.' % self.__arguments.concurrency)
+
+        if self.__arguments.download_concurrency < 1:
+            sys.exit('Your download concurrency value (%d) must be 1 or greater.' % self.__arguments.download_concurrency)
+
+    def __validateConnectionPool(self):
+        if self.__arguments.pool_size is not None and self.__arguments.pool_size < 1:
+            sys.exit('Your pool size value (%d) must be 1 or greater.' % self.__arguments.pool_size)
+
+        if self.__arguments.pool_hosts < 1:
+            sys.exit('Your pool hosts value (%d) must be 1 or greater.' % self.__arguments.pool_hosts)
+
     def __validateCsv(self):
+        import csv
+
+        from core.TemplatePatcher import TemplatePatcher
+
+        # Only the header row is checked up front, each of the other rows is checked as it is read
         if self.__arguments.input_csv:
             try:
-                returnList = []
-
-                with open(self.__arguments.input_csv, 'r') as csvInputFile:
-                    reader = csv.DictReader(csvInputFile)
-
-                    for row in reader:
-                        for key, value in row.items():
-                            if not key or not value:
-                                raise AttributeError('There is an empty header or value in the input CSV file (%s)' % self.__arguments.input_csv)
-                            
-                            # Some requests doesn't customise the JSON template, instead the CSV are a list of points/sites which are passed through to the request
-                            if self.requestType == 'points' or self.requestType == 'multisite':
-                                submittedHeaders = list(row.keys())
-                                
-                                if self.requestType == 'points':
-                                    requiredHeaders = self.CSV_REQUIRED_HEADERS_POINTS
-                                elif self.requestType == 'multisite':
-                                    requiredHeaders = self.CSV_REQUIRED_HEADERS_MULTISITE
-                                
-                                if set(requiredHeaders) != set(submittedHeaders):
-                                    raise AttributeError('You have a bad CSV header. You are missing at least one of the following header keys from your CSV: %s' % requiredHeaders)
-
-                            # We are using dot notation, a header should never be more than 2 deep
-                            parts = str(key).split('.')
-
-                            if len(parts) > 2:
-                                raise AttributeError('Maximum depth of dot notation is 2. You have a value with a depth of %d in the input CSV file (%s)' % (len(parts), self.__arguments.input_csv))
-
-                        returnList.append(row)
-                        
-                return returnList
+                with open(self.__arguments.input_csv, 'r', newline = '') as csvInputFile:
+                    submittedHeaders = csv.DictReader(csvInputFile).fieldnames or []
+
+                for key in submittedHeaders:
+                    if not key:
+                        raise AttributeError('There is an empty header in the input CSV file (%s)' % self.__arguments.input_csv)
+
+                # Some requests doesn't customise the JSON template, instead the CSV are a list of points/sites which are passed through to the request
+                if self.requestType == 'points' or self.requestType == 'multisite':
+                    if self.requestType == 'points':
+                        requiredHeaders = self.CSV_REQUIRED_HEADERS_POINTS
+                    elif self.requestType == 'multisite':
+                        requiredHeaders = self.CSV_REQUIRED_HEADERS_MULTISITE
+
+                    if set(requiredHeaders) != set(submittedHeaders):
+                        raise AttributeError('You have a bad CSV header. You are missing at least one of the following header keys from your CSV: %s' % requiredHeaders)
+                else:
+                    # Headers use dot notation of any depth, each is only split into its path through the template once rather than for every row
+                    try:
+                        self.__templatePatcher = TemplatePatcher(templateJson = self.__jsonTemplate, headers = submittedHeaders)
+                    except ValueError as e:
+                        raise AttributeError('%s Please check the header row of the input CSV file (%s)' % (e, self.__arguments.input_csv))
             except PermissionError:
                 sys.exit('Permission error when trying to read input CSV file (%s)' % self.__arguments.input_csv)
             except AttributeError as e:
                 sys.exit(e)
-            except:
+            except Exception:
                 sys.exit('An unknown error occurred when checking input CSV file (%s)' % (self.__arguments.input_csv))
 
+    def __validateDownloadChunkSize(self):
+        if self.__arguments.download_chunk_size < 1:
+            sys.exit('Your download chunk size value (%d) must be 1 or greater.' % self.__arguments.download_chunk_size)
+
     def __validateFileAndDirectoryPermissions(self):
         if hasattr(self.__arguments, 'input_template') and self.__arguments.input_template:
             if not os.path.exists(self.__arguments.input_template):
@@ -532,15 +889,18 @@ class CloudRF:
 
         self.__verboseLog('Output directory (%s) exists with permissions: %s' % (self.__arguments.output_directory, oct(stat.S_IMODE(os.lstat(self.__arguments.output_directory).st_mode))))
 
-        try:
-            # Check if any file can be written to the output directory
-            rawTestFilePath = str(self.__arguments.output_directory).rstrip('/').rstrip('\\')
-            testFilePath = os.path.join(rawTestFilePath, 'tmp')
-            open(testFilePath, 'a')
-            os.remove(testFilePath)
-        except PermissionError:
+        # Check if any file can be created in the output directory, without writing to the disk
+        if not os.access(self.__arguments.output_directory, os.W_OK | os.X_OK):
             sys.exit('Unable to create files in output directory (%s)' % self.__arguments.output_directory)
 
+    def __validateJsonBackend(self):
+        try:
+            JsonSerializer.setBackend(self.__arguments.json_backend)
+        except ValueError as e:
+            sys.exit(e)
+
+        self.__verboseLog('Using the %s JSON backend.' % JsonSerializer.backend())
+
     def __validateJsonTemplate(self):
         try:
             with open(self.__arguments.input_template, 'r') as jsonTemplateFile:
@@ -552,12 +912,26 @@ class CloudRF:
         except:
             sys.exit('An unknown error occurred when checking input template JSON file (%s)' % (self.__arguments.input_template))
 
+    def __validateMaxPointsPerRequest(self):
+        if self.requestType in ['multisite', 'points'] and self.__arguments.max_points_per_request < 0:
+            sys.exit('Your maximum points per request value (%d) must be 0 or greater.' % self.__arguments.max_points_per_request)
+
+    def __validateRateLimit(self):
+        if self.__arguments.rate_limit < 0:
+            sys.exit('Your rate limit value (%g) must be 0 or greater.' % self.__arguments.rate_limit)
+
+        if self.__arguments.burst < 1:
+            sys.exit('Your burst value (%d) must be 1 or greater.' % self.__arguments.burst)
+
+        if self.__arguments.wait is not None and self.__arguments.wait < 0:
+            sys.exit('Your wait value (%g) must be 0 or greater.' % self.__arguments.wait)
+
     def __validateRequestType(self):
         if self.requestType and self.requestType in self.ALLOWED_REQUEST_TYPES:
             self.__verboseLog('Valid request type of %s being used.' % self.requestType)
+            self.allowedOutputTypes = CloudRFRequest.OUTPUT_FILE_TYPES[self.requestType]
 
             if self.requestType == 'area':
-                self.allowedOutputTypes = ['kmz', 'png', 'shp', 'tiff', 'url']
                 self.description = '''
                     CloudRF Area API
 
@@ -565,7 +939,6 @@ class CloudRF:
                     It factors in system parameters, antenna patterns, environmental characteristics and terrain data to show a heatmap in customisable colours and units.
                 '''
             elif self.requestType == 'interference':
-                self.allowedOutputTypes = ['png']
                 self.description = '''
                     CloudRF Interference API
 
@@ -573,7 +946,6 @@ class CloudRF:
                     In order to properly use the interference API you area required to have area calculations already completed which have a common network name.
                 '''
             elif self.requestType == 'mesh':
-                self.allowedOutputTypes = ['kmz', 'png']
                 self.description = '''
                     CloudRF Mesh API
 
@@ -581,7 +953,6 @@ class CloudRF:
                     In order to properly use the mesh API you area required to have area calculations already completed which have a common network name.
                 '''
             elif self.requestType == 'multisite':
-                self.allowedOutputTypes = ['png']
                 self.description = '''
                     CloudRF Multisite API
 
@@ -589,7 +960,6 @@ class CloudRF:
                     It uses multiple transmitter locations to produce one response which factors in each transmitter.
                 '''
             elif self.requestType == 'network':
-                self.allowedOutputTypes = ['txt']
                 self.description = '''
                     CloudRF Network API
 
@@ -597,7 +967,6 @@ class CloudRF:
                     In order to properly use the network API you area required to have area calculations already completed which have a common network name.
                 '''
             elif self.requestType == 'path':
-                self.allowedOutputTypes = ['kmz', 'png']
                 self.description = '''
                     CloudRF Path API
 
@@ -605,7 +974,6 @@ class CloudRF:
                     It factors in system parameters, antenna patterns, environmental characteristics and terrain data to produce a JSON report containing enough values to incorporate into your analysis or create a chart from.
                 '''
             elif self.requestType == 'points':
-                self.allowedOutputTypes = ['kmz']
                 self.description = '''
                     CloudRF Points API
 
@@ -616,17 +984,46 @@ class CloudRF:
         else:
             sys.exit('Unsupported request type of "%s" being used. Allowed request types are: %s' % (self.requestType, self.ALLOWED_REQUEST_TYPES))
 
+    def __validateRetries(self):
+        if self.__arguments.max_retries < 0:
+            sys.exit('Your max retries value (%d) must be 0 or greater.' % self.__arguments.max_retries)
+
+        if self.__arguments.retry_backoff < 0 or self.__arguments.retry_max_backoff < 0:
+            sys.exit('Your retry backoff values must be 0 or greater.')
+
+    def __validateTimeout(self):
+        if self.__arguments.timeout is not None and self.__arguments.timeout <= 0:
+            sys.exit('Your timeout value (%g) must be greater than 0.' % self.__arguments.timeout)
+
     def __verboseLog(self, message):
         try:
             if self.__arguments.verbose:
-                print(message)
+                self.__log(message)
         except:
             pass
 
-if __name__ == '__main__':
-    try:
-        CloudRF(
-            REQUEST_TYPE = sys.argv[1]
-        )
-    except IndexError:
+    def __waitForDownloads(self):
+        import concurrent.futures
+
+        with self.__downloadFuturesLock:
+            downloadFutures = list(self.__downloadFutures)
+
+        self.__verboseLog('Waiting for %d output file downloads to complete.' % len(downloadFutures))
+
+        for future in concurrent.futures.as_completed(downloadFutures):
+            future.result()
+
+def main(argv = None):
+    # The first argument is the type of request, everything after it is passed to argparse
+    arguments = sys.argv[1:] if argv is None else list(argv)
+
+    if not arguments:
         sys.exit('This script should be executed by specifying the request type you wish to run. Please pass in one of the following arguments after the call of this script: %s' % CloudRF.ALLOWED_REQUEST_TYPES)
+
+    CloudRF(
+        REQUEST_TYPE = arguments[0],
+        ARGUMENTS = arguments[1:]
+    )
+
+if __name__ == '__main__':
+    main()
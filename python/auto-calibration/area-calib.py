@@ -1,19 +1,28 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import numpy as np
 import pandas as pd
+import queue
 import random
 import requests
 import time
 import math
+import os
 from io import BytesIO
 import rasterio
 import sys
+import threading
 import urllib3
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 CLUTTER_PROFILE = 'AreaCalibPy'
 
+class AreaRequestError(Exception):
+    pass
+
 config_spec = {
     'site': {'kind': 'fixed', 'value': 'CALIBRATIONSITE'},
     'network': {'kind': 'fixed', 'value': 'CALIBRATION'},
@@ -60,6 +69,21 @@ config_spec = {
 
 status_message_depth = 0
 
+# Settings of the surrogate optimiser, the length scales are in the space of config_to_vector
+SURROGATE_LENGTH_SCALES = [0.05, 0.1, 0.2, 0.4, 0.8, 1.6]
+SURROGATE_NOISE = 1e-4
+SURROGATE_RANDOM_CANDIDATES = 2000
+SURROGATE_MUTATED_CANDIDATES = 1000
+SURROGATE_PARENT_COUNT = 5
+
+# The errors of every config which has been scored, as {key: (min_error, mean_error, max_error)}
+fitness_memo = {}
+fitness_memo_lock = threading.Lock()
+
+# Everything needed to carry on from the last scored config, as {'generation': ..., 'population': [...], 'children': [...] or None,
+# 'best_errors': [...], 'area_calls': ...}
+checkpoint_state = {}
+
 class ArgparseCustomFormatter(
         # Don't do any line wrapping on descriptions
         argparse.RawDescriptionHelpFormatter, 
@@ -91,7 +115,7 @@ def print_message(message):
     sys.stdout.write('\n')
     sys.stdout.flush()
 
-def create_clutter_profile(config):
+def create_clutter_profile(config, profile_name):
 
     headers = {
         'key': args.api_key,
@@ -121,7 +145,7 @@ def create_clutter_profile(config):
     ]
 
     data = {
-        'save': CLUTTER_PROFILE,
+        'save': profile_name,
         'values': '\n'.join(lines)
     }
 
@@ -171,7 +195,7 @@ def populate_config_from_template():
         value = get_nested_value(template_file, path)
         config_spec[path]['value'] = value
 
-def build_area_request(config):
+def build_area_request(config, profile_name):
     request = {}
 
     for key, value_spec in config_spec.items():
@@ -197,6 +221,8 @@ def build_area_request(config):
             dict = dict[key]
         dict[keys[-1]] = value
 
+    request['environment']['clt'] = profile_name + '.clt'
+
     return request
 
 def send_area_request(request):
@@ -212,67 +238,291 @@ def send_area_request(request):
         response = requests.post(f"{apiUrl}", json=request, headers=headers, verify=args.strict_ssl)
         response.raise_for_status()
     except requests.exceptions.HTTPError as e:
-        print(f"HTTP error: {e}")
+        # Raised rather than printed, as this may be a worker thread. The whole message is shown at once by the main thread.
+        message = f"HTTP error: {e}"
 
         if e.response is not None:
-            print(f"Status code: {e.response.status_code}")
-            print(f"Response content: {e.response.text}")
+            message += f"\nStatus code: {e.response.status_code}"
+            message += f"\nResponse content: {e.response.text}"
 
-        print(f"Request payload: {json.dumps(request, indent=4)}")
-        exit(1)
+        message += f"\nRequest payload: {json.dumps(request, indent=4)}"
+        raise AreaRequestError(message) from e
 
     return response.json()
 
-def calculate_config_error(config, batch):
+def print_config_status_message(message):
+    # Only shown when configs are scored one at a time, as the messages of several workers would overwrite each other
+    if args.workers == 1:
+        print_status_message(message, depth=1)
 
-    total_error = 0
-    min_error = None
-    max_error = None
+def calculate_config_error(config, batch, profile_name):
 
-    print_status_message('Creating clutter profile', depth=1)
-    create_clutter_profile(config)
+    print_config_status_message('Creating clutter profile')
+    create_clutter_profile(config, profile_name)
 
-    request = build_area_request(config)
+    request = build_area_request(config, profile_name)
 
-    print_status_message('Performing area calculation', depth=1)
+    print_config_status_message('Performing area calculation')
     response = send_area_request(request)
 
     tiff_url = response['kmz'][:-3] + 'tiff'
 
-    print_status_message('Downloading area output tiff', depth=1)
+    print_config_status_message('Downloading area output tiff')
     response = requests.get(tiff_url, verify=args.strict_ssl)
     response.raise_for_status()
 
+    print_config_status_message(f'Calculating error for {len(batch)} data points')
+
     with rasterio.open(BytesIO(response.content)) as tiff:
-        for i, row in batch.iterrows():
-            print_status_message(f'Calculating error for data {i:>{len(str(len(batch)))}}/{len(batch)}', depth=1)
-            lat = row['latitude']
-            lon = row['longitude']
+        # The band is read once and every point is looked up in it at the same time
+        band = tiff.read(1)
+        rows, cols = rasterio.transform.rowcol(tiff.transform, batch['longitude'].to_numpy(), batch['latitude'].to_numpy())
+
+    rows = np.asarray(rows)
+    cols = np.asarray(cols)
+    inside = (rows >= 0) & (rows < band.shape[0]) & (cols >= 0) & (cols < band.shape[1])
 
-            expected = row['received_power']
+    red = np.zeros(len(batch), dtype=np.int64)
+    red[inside] = band[rows[inside], cols[inside]]
 
-            y, x = tiff.index(lon, lat)
+    # Points outside the tiff or with no signal are at the receiver sensitivity
+    actual = np.where(red != 0, -red, request['receiver']['rxs'])
+    errors = actual - batch['received_power'].to_numpy()
 
-            actual = None
+    return float(errors.min()), float(np.abs(errors).mean()), float(errors.max())
 
-            if 0 <= x < tiff.width and 0 <= y < tiff.height:
-                red = int(tiff.read()[0, y, x])
-                if red != 0:
-                    actual = -red
+def calculate_config_fitness(config):
+    return math.exp(-config['mean_error'])
 
-            if actual == None:
-                actual = request['receiver']['rxs']
+def quantise_config(config):
+    # Continuous values are rounded so that configs which only differ by a tiny amount share a fitness memo entry
+    for key, value_spec in config_spec.items():
+        if value_spec['kind'] == 'continuous':
+            if 'cast' in value_spec:
+                config[key] = value_spec['cast'](config[key])
+            else:
+                config[key] = round(config[key], args.cache_decimals)
+
+def fitness_memo_key(config):
+    # Anything which changes the result of a config is part of the key, other than the name of the clutter profile it was saved as
+    values = {key: config[key] for key, value_spec in config_spec.items() if value_spec['kind'] != 'fixed'}
+    fixed_values = {key: value_spec['value'] for key, value_spec in config_spec.items() if value_spec['kind'] == 'fixed' and key != 'environment.clt'}
+    key = json.dumps([values, fixed_values, dataset_hash, args.base_url.rstrip('/')], sort_keys=True)
+
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def load_fitness_memo(path):
+    memo = {}
+
+    if path is None or not os.path.exists(path):
+        return memo
+
+    # Where the last line which ended with a newline finished, anything after it was cut short when a run was stopped
+    complete_bytes = 0
+    tail_is_record = False
+
+    with open(path, 'rb') as memo_file:
+        for line in memo_file:
+            if line.endswith(b'\n'):
+                complete_bytes += len(line)
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may have been cut short if a run was stopped while saving it
+                tail_is_record = False
+                continue
+
+            tail_is_record = True
+            memo[record['key']] = (record['min_error'], record['mean_error'], record['max_error'])
+
+    # The next result must start on a line of its own, otherwise it would be appended to the cut off line and lost along with it.
+    # A result which was only missing its newline is kept, anything else is removed.
+    if complete_bytes != os.path.getsize(path):
+        with open(path, 'r+b') as memo_file:
+            if tail_is_record:
+                memo_file.seek(0, os.SEEK_END)
+                memo_file.write(b'\n')
+            else:
+                memo_file.truncate(complete_bytes)
 
-            error = actual - expected
-            total_error += abs(error)
+    return memo
 
-            min_error = error if min_error == None else min(error, min_error)
-            max_error = error if max_error == None else max(error, max_error)
+def save_fitness(key, errors):
+    with fitness_memo_lock:
+        fitness_memo[key] = errors
 
-    return min_error, total_error / len(batch), max_error
+        if args.cache_file is not None:
+            with open(args.cache_file, 'a') as memo_file:
+                min_error, mean_error, max_error = errors
+                memo_file.write(json.dumps({'key': key, 'min_error': min_error, 'mean_error': mean_error, 'max_error': max_error}) + '\n')
 
-def calculate_config_fitness(config):
-    return math.exp(-config['mean_error'])
+def budget_stop_reason():
+    # Checked before each area calculation, so that the run never pays for more than it was allowed
+    if args.max_runtime is not None and time.time() - start_time >= args.max_runtime:
+        return f'the maximum runtime of {args.max_runtime:g} seconds was reached'
+
+    if args.max_area_calls is not None and checkpoint_state['area_calls'] >= args.max_area_calls:
+        return f'the maximum of {args.max_area_calls} area calls was reached'
+
+    return None
+
+def convergence_stop_reason(best_errors):
+    # Checked once each generation is complete, best_errors holds the best mean error after each generation
+    if args.target_error is not None and best_errors[-1] <= args.target_error:
+        return f'the best mean error of {best_errors[-1]:.3g} reached the target of {args.target_error:g}'
+
+    if args.stall_generations is not None and len(best_errors) > args.stall_generations:
+        if best_errors[-args.stall_generations - 1] - best_errors[-1] < args.min_improvement:
+            return f'the best mean error improved by less than {args.min_improvement:g} in {args.stall_generations} generations'
+
+    return budget_stop_reason()
+
+def set_config_errors(config, errors):
+    config['min_error'], config['mean_error'], config['max_error'] = errors
+    config['fitness'] = calculate_config_fitness(config)
+
+def score_config(config, batch):
+    # The errors are returned rather than set on the config, as configs are only changed on the main thread where save_checkpoint runs.
+    # A clutter profile is only used by one config at a time, so configs scored at the same time never overwrite each other's profile
+    profile_name = clutter_profile_names.get()
+
+    with fitness_memo_lock:
+        checkpoint_state['area_calls'] += 1
+
+    try:
+        errors = calculate_config_error(config, batch, profile_name)
+    finally:
+        clutter_profile_names.put(profile_name)
+
+    save_fitness(fitness_memo_key(config), errors)
+
+    return errors
+
+def evaluate_configs(configs, batch):
+    # Returns True once every config has been scored, or False if the run had to stop first because of --max-runtime or --max-area-calls
+    width = len(str(len(configs)))
+
+    def print_config_error(i, cached=False):
+        config = configs[i]
+        print_message(f'Config {i+1:>{width}}/{len(configs)} error:    min {config['min_error']:>4}    mean {config['mean_error']:>4.2g}    max {config['max_error']:>4}{'    (cached)' if cached else ''}')
+
+    # Configs which were scored before a resumed run stopped are left as they are
+    unscored_indices = [i for i, config in enumerate(configs) if 'fitness' not in config]
+
+    # Configs which have been scored before, by this run or by an earlier one, are not sent again. Neither is a config which is the
+    # same as another in this generation, it is given the result of the first once that has been scored.
+    first_indices = {}
+    for i in unscored_indices:
+        config = configs[i]
+        quantise_config(config)
+        key = fitness_memo_key(config)
+        if key not in fitness_memo and key not in first_indices:
+            first_indices[key] = i
+
+    indices = list(first_indices.values())
+
+    if args.max_area_calls is not None:
+        indices = indices[:max(0, args.max_area_calls - checkpoint_state['area_calls'])]
+
+    # Only configs which were actually scored are misses, not those left unscored by --max-runtime or --max-area-calls
+    hits = 0
+    misses = 0
+
+    try:
+        if args.workers == 1:
+            for i in indices:
+                if budget_stop_reason() is not None:
+                    break
+                print_status_message(f'Calculating error for config {i+1:>{width}}/{len(configs)}')
+                set_config_errors(configs[i], score_config(configs[i], batch))
+                misses += 1
+                save_checkpoint()
+                print_config_error(i)
+        elif indices:
+            print_status_message(f'Calculating error for {len(indices)} configs with {args.workers} workers')
+
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                futures = {executor.submit(score_config, configs[i], batch): i for i in indices}
+
+                for completed, future in enumerate(as_completed(futures)):
+                    if future.cancelled():
+                        continue
+
+                    try:
+                        errors = future.result()
+                    except BaseException:
+                        # Configs which have not started yet are not worth scoring once one has failed
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+
+                    set_config_errors(configs[futures[future]], errors)
+                    misses += 1
+
+                    # Configs which have not started yet are left unscored once the runtime is up
+                    if budget_stop_reason() is not None:
+                        for pending in futures:
+                            pending.cancel()
+
+                    save_checkpoint()
+                    print_config_error(futures[future])
+                    print_status_message(f'Calculated error for {completed+1:>{width}}/{len(indices)} configs with {args.workers} workers')
+    except (AreaRequestError, requests.exceptions.RequestException) as e:
+        # Configs which were scored before this one failed are already saved, so the run can be carried on with --resume
+        clear_status_message()
+        sys.exit(f'Unable to score a config: {e}')
+
+    for i in unscored_indices:
+        config = configs[i]
+        if 'fitness' not in config and fitness_memo_key(config) in fitness_memo:
+            set_config_errors(config, fitness_memo[fitness_memo_key(config)])
+            hits += 1
+            print_config_error(i, cached=True)
+
+    save_checkpoint()
+    print_message(f'Fitness cache: {hits} hits, {misses} misses')
+
+    return all('fitness' in config for config in configs)
+
+def save_checkpoint():
+    # Written to a temporary file first, so that stopping the script while it is saving never leaves a broken checkpoint behind
+    if args.checkpoint_file is None:
+        return
+
+    checkpoint = dict(checkpoint_state)
+    checkpoint['random_state'] = random.getstate()
+    checkpoint['dataset_hash'] = dataset_hash
+    checkpoint['population_count'] = args.population_count
+    checkpoint['elite_count'] = args.elite_count
+    checkpoint['optimiser'] = args.optimiser
+
+    temporary_path = args.checkpoint_file + '.tmp'
+    with open(temporary_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temporary_path, args.checkpoint_file)
+
+def load_checkpoint(path):
+    try:
+        with open(path, 'r') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except FileNotFoundError:
+        raise ValueError(f'No checkpoint to resume from at {path}')
+
+    if checkpoint['dataset_hash'] != dataset_hash:
+        raise ValueError(f'The checkpoint at {path} was made with different input CSV data')
+
+    for name in ['optimiser', 'population_count', 'elite_count']:
+        # Checkpoints from before an option existed were made with its default
+        checkpoint_value = checkpoint.get(name, parser.get_default(name))
+        if checkpoint_value != getattr(args, name):
+            raise ValueError(f'The checkpoint at {path} was made with a --{name.replace('_', '-')} of {checkpoint_value}')
+
+    # JSON has no tuples, which the state of the random number generator is made of
+    version, internal_state, gauss_next = checkpoint['random_state']
+    random.setstate((version, tuple(internal_state), gauss_next))
+
+    return checkpoint
 
 def select_parent_configs(population):
     count = 2 * args.population_count
@@ -326,6 +576,97 @@ def mutate_config(config):
                 mutant[key] = config[key]
     return mutant
 
+def config_to_vector(config):
+    # Continuous values are scaled to between 0 and 1 and discrete values are one-hot encoded, so that every kind of value is as far apart
+    vector = []
+    for key, value_spec in config_spec.items():
+        if value_spec['kind'] == 'continuous':
+            vector.append((config[key] - value_spec['min']) / (value_spec['max'] - value_spec['min']))
+        elif value_spec['kind'] == 'discrete':
+            vector.extend(1.0 if config[key] == option else 0.0 for option in value_spec['options'])
+    return vector
+
+def squared_distances(a, b):
+    return np.maximum((a ** 2).sum(axis=1)[:, None] + (b ** 2).sum(axis=1)[None, :] - 2 * a @ b.T, 0)
+
+def fit_gaussian_process(x, y):
+    # A Gaussian process with a squared exponential kernel, using the length scale which best explains the configs scored so far
+    y_mean = y.mean()
+    y_std = y.std() if y.std() > 0 else 1.0
+    z = (y - y_mean) / y_std
+    distances = squared_distances(x, x)
+
+    best = None
+    for length_scale in SURROGATE_LENGTH_SCALES:
+        kernel = np.exp(-0.5 * distances / length_scale ** 2) + SURROGATE_NOISE * np.eye(len(x))
+        try:
+            cholesky = np.linalg.cholesky(kernel)
+        except np.linalg.LinAlgError:
+            continue
+        alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, z))
+        log_likelihood = -0.5 * z @ alpha - np.log(np.diag(cholesky)).sum()
+        if best is None or log_likelihood > best[0]:
+            best = (log_likelihood, length_scale, cholesky, alpha)
+
+    # None of the length scales could be fitted, such as when several scored configs are too close together
+    if best is None:
+        return None
+
+    _, length_scale, cholesky, alpha = best
+
+    def predict(candidates):
+        covariance = np.exp(-0.5 * squared_distances(candidates, x) / length_scale ** 2)
+        mean = covariance @ alpha
+        variance = 1 - (np.linalg.solve(cholesky, covariance.T) ** 2).sum(axis=0)
+        return mean * y_std + y_mean, np.sqrt(np.maximum(variance, 1e-12)) * y_std
+
+    return predict
+
+def expected_improvement(mean, std, best_error):
+    # How much each candidate is expected to lower the best mean error, which favours both good and uncertain candidates
+    improvement = best_error - mean
+    z = improvement / std
+    cdf = 0.5 * (1 + np.array([math.erf(value / math.sqrt(2)) for value in z]))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return improvement * cdf + std * pdf
+
+def propose_surrogate_configs(population, count):
+    # Candidates are random configs and mutations of the best configs, the one with the highest expected improvement is chosen. For
+    # more than one, the chosen config is assumed to score what the model predicts and the model is fitted again, so that the next
+    # config is chosen somewhere else.
+    best_configs = sorted(population, key=lambda config: config['mean_error'])[:SURROGATE_PARENT_COUNT]
+    candidates = [generate_random_config() for _ in range(SURROGATE_RANDOM_CANDIDATES)]
+    candidates += [mutate_config(random.choice(best_configs)) for _ in range(SURROGATE_MUTATED_CANDIDATES)]
+
+    # Candidates which have already been scored would only be a cache hit
+    for candidate in candidates:
+        quantise_config(candidate)
+    candidates = [candidate for candidate in candidates if fitness_memo_key(candidate) not in fitness_memo]
+
+    x = np.array([config_to_vector(config) for config in population])
+    y = np.array([config['mean_error'] for config in population])
+    candidate_x = np.array([config_to_vector(config) for config in candidates])
+
+    proposals = []
+    proposal_count = min(count, len(candidates))
+    for _ in range(proposal_count):
+        predict = fit_gaussian_process(x, y)
+
+        # Without a model the rest of this generation is made of random candidates, rather than stopping a long run
+        if predict is None:
+            proposals += random.sample(candidates, proposal_count - len(proposals))
+            break
+
+        mean, std = predict(candidate_x)
+        chosen = int(np.argmax(expected_improvement(mean, std, y.min())))
+        proposals.append(candidates[chosen])
+        x = np.vstack([x, candidate_x[chosen]])
+        y = np.append(y, mean[chosen])
+        candidates.pop(chosen)
+        candidate_x = np.delete(candidate_x, chosen, axis=0)
+
+    return proposals
+
 def print_config(config):
     print_message(f'    Min Error : {config['min_error']:>8}')
     print_message(f'   Mean Error : {config['mean_error']:>8.2g}')
@@ -363,6 +704,9 @@ if __name__ == '__main__':
         'This script attempts to fit calibration data against CloudRF area calculations, and then uses a genetic algorithm to calibrate the settings.',
         '',
         'The number of area calls required will be POPULATION_COUNT X (MAX_GENERATION + 1)',
+        '',
+        'With --optimiser surrogate, a model of the configs scored so far is used to choose the next config to score instead, which needs',
+        'POPULATION_COUNT + WORKERS X MAX_GENERATION area calls.',
     ]
 
     parser = argparse.ArgumentParser(
@@ -375,7 +719,19 @@ if __name__ == '__main__':
     parser.add_argument('--no-strict-ssl', dest = 'strict_ssl', action="store_false", default = True, help = 'Do not verify the SSL certificate to the CloudRF API service.')
     parser.add_argument('-k', '--api-key', dest = 'api_key', required = True, help = 'Your API key to the CloudRF API service.')
     parser.add_argument('-w', '--wait', dest = 'wait', type = float, default = 0.1, help = 'Time in seconds to wait before running the next calculation.')
-
+    parser.add_argument('--workers', dest = 'workers', type = int, default = 1, help = 'The number of configs to score at the same time. Each worker waits --wait seconds before each of its own calculations, so up to WORKERS / WAIT calculations are started per second. Each worker saves its own clutter profile.')
+
+    parser.add_argument('--cache-file', dest = 'cache_file', default = 'area-calib-cache.jsonl', help = 'Path of the file which the errors of every scored config are saved to, so that the same config is never calculated again by this or a later run.')
+    parser.add_argument('--no-cache', dest = 'cache_file', action = 'store_const', const = None, help = 'Do not load or save scored configs from a cache file. Configs repeated within the run are still only calculated once.')
+    parser.add_argument('--cache-decimals', dest = 'cache_decimals', type = int, default = 3, help = 'The number of decimal places continuous values are rounded to, so that nearly identical configs share a cached result.')
+    parser.add_argument('--checkpoint-file', dest = 'checkpoint_file', default = 'area-calib-checkpoint.json', help = 'Path of the file which progress is saved to after every scored config.')
+    parser.add_argument('--resume', dest = 'resume', action = 'store_true', default = False, help = 'Carry on from the checkpoint file of a run which was stopped, without scoring any finished config again.')
+    parser.add_argument('--optimiser', dest = 'optimiser', choices = ['ga', 'surrogate'], default = 'ga', help = 'Search with a genetic algorithm, or with a Gaussian process model which chooses the config most likely to improve on the best.')
+    parser.add_argument('--stall-generations', dest = 'stall_generations', type = int, default = None, help = 'Stop once the best mean error has improved by less than --min-improvement over this many generations.')
+    parser.add_argument('--min-improvement', dest = 'min_improvement', type = float, default = 0.01, help = 'The improvement in the best mean error, in dB, which --stall-generations needs to keep going.')
+    parser.add_argument('--target-error', dest = 'target_error', type = float, default = None, help = 'Stop once the best mean error, in dB, is this or lower.')
+    parser.add_argument('--max-runtime', dest = 'max_runtime', type = float, default = None, help = 'Stop starting new area calculations after this many seconds.')
+    parser.add_argument('--max-area-calls', dest = 'max_area_calls', type = int, default = None, help = 'Stop once this many area calculations have been made, including those made before a resumed run stopped. Cached configs are not counted.')
     parser.add_argument('--population-count', dest = 'population_count', type = int, default = 10, help = 'The number of configs in a generation.')
     parser.add_argument('--max-generation', dest = 'max_generation', type = int, default = 10, help = 'The maximum number of generations to run.')
     parser.add_argument('--elite-count', dest = 'elite_count', type = int, default = 3, help = 'The number of elite configs to retain for the next generation, chosen by best fit.')
@@ -384,23 +740,75 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
+    if args.workers < 1:
+        parser.error('--workers must be 1 or greater.')
+
+    if args.stall_generations is not None and args.stall_generations < 1:
+        parser.error('--stall-generations must be 1 or greater.')
+
     if args.strict_ssl == False:
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+    # A single worker keeps using the same clutter profile as before
+    if args.workers == 1:
+        profile_names = [CLUTTER_PROFILE]
+    else:
+        profile_names = [f'{CLUTTER_PROFILE}{i+1}' for i in range(args.workers)]
+
+    clutter_profile_names = queue.Queue()
+    for profile_name in profile_names:
+        clutter_profile_names.put(profile_name)
+
     populate_config_from_template()
     dataset = load_csv(args.input_csv)
+    dataset_hash = hashlib.sha256(pd.util.hash_pandas_object(dataset, index=False).values.tobytes()).hexdigest()
 
     print_message(f"loaded dataset with {len(dataset)} rows")
 
-    population = [generate_random_config() for _ in range(0, args.population_count)]
-
-    for i, config in enumerate(population):
-        print_status_message(f'Calculating error for config {i+1:>{len(str(args.population_count))}}/{args.population_count}')
-        config['min_error'], config['mean_error'], config['max_error'] = calculate_config_error(config, dataset)
-        config['fitness'] = calculate_config_fitness(config)
-        print_message(f'Config {i+1:>{len(str(args.population_count))}}/{args.population_count} error:    min {config['min_error']:>4}    mean {config['mean_error']:>4.2g}    max {config['max_error']:>4}')
+    fitness_memo = load_fitness_memo(args.cache_file)
+    if fitness_memo:
+        print_message(f"loaded {len(fitness_memo)} scored configs from {args.cache_file}")
+
+    if args.resume:
+        try:
+            checkpoint = load_checkpoint(args.checkpoint_file)
+        except ValueError as e:
+            sys.exit(f'Unable to resume: {e}')
+
+        population = checkpoint['population']
+        children = checkpoint['children']
+        start_generation = checkpoint['generation']
+        best_errors = checkpoint.get('best_errors', [])
+        area_calls = checkpoint.get('area_calls', 0)
+        print_message(f"resuming from generation {start_generation} of {args.checkpoint_file}")
+    else:
+        population = [generate_random_config() for _ in range(0, args.population_count)]
+        children = None
+        start_generation = 0
+        best_errors = []
+        area_calls = 0
+
+    if args.checkpoint_file is not None:
+        print_message(f"progress is saved to {args.checkpoint_file}, run again with --resume to carry on if the script is stopped")
+
+    start_time = time.time()
+    checkpoint_state.update(generation=start_generation, population=population, children=children, best_errors=best_errors, area_calls=area_calls)
+    save_checkpoint()
+
+    stop_reason = None
+    completed_generation = start_generation
+
+    if not evaluate_configs(population, dataset):
+        stop_reason = budget_stop_reason()
+    elif not best_errors:
+        best_errors.append(min(config['mean_error'] for config in population))
+        save_checkpoint()
+
+    for generation in range(start_generation, args.max_generation):
+        stop_reason = stop_reason or convergence_stop_reason(best_errors)
+        if stop_reason is not None:
+            break
 
-    for generation in range(0, args.max_generation):
         print_status_message(f'Sorting config population')
         population = sorted(population, key=lambda config: config['fitness'])
         worst = population[0]
@@ -415,34 +823,62 @@ if __name__ == '__main__':
         print_config(best)
         print_message(f"")
 
-        print_status_message(f'Selecting parent configs')
-        parent_indices = select_parent_configs(population)
-        random.shuffle(parent_indices)
+        # A resumed run may already have the children of this generation
+        if children is None and args.optimiser == 'surrogate':
+            print_status_message(f'Fitting surrogate model')
+            children = propose_surrogate_configs(population, args.workers)
 
-        parent_index_pairs = [(parent_indices[2 * i], parent_indices[2 * i + 1])  for i in range(0, args.population_count)]
+            checkpoint_state.update(generation=generation, population=population, children=children)
+            save_checkpoint()
+        elif children is None:
+            print_status_message(f'Selecting parent configs')
+            parent_indices = select_parent_configs(population)
+            random.shuffle(parent_indices)
 
-        print_status_message(f'Creating child configs')
-        children = [crossover_configs(population[a], population[b]) for (a, b) in parent_index_pairs]
-        print_status_message(f'Mutating child configs')
-        children = [mutate_config(config) for config in children]
+            parent_index_pairs = [(parent_indices[2 * i], parent_indices[2 * i + 1])  for i in range(0, args.population_count)]
 
-        for i, config in enumerate(children):
-            print_status_message(f'Calculating error for config {i+1:>{len(str(args.population_count))}}/{args.population_count}')
-            config['min_error'], config['mean_error'], config['max_error'] = calculate_config_error(config, dataset)
-            config['fitness'] = calculate_config_fitness(config)
-            print_message(f'Config {i+1:>{len(str(args.population_count))}}/{args.population_count} error:    min {config['min_error']:>4}    mean {config['mean_error']:>4.2g}    max {config['max_error']:>4}')
+            print_status_message(f'Creating child configs')
+            children = [crossover_configs(population[a], population[b]) for (a, b) in parent_index_pairs]
+            print_status_message(f'Mutating child configs')
+            children = [mutate_config(config) for config in children]
 
-        children = sorted(children, key=lambda config: config['fitness'])
+            checkpoint_state.update(generation=generation, population=population, children=children)
+            save_checkpoint()
+
+        if not evaluate_configs(children, dataset):
+            stop_reason = budget_stop_reason()
+            break
+
+        if args.optimiser == 'surrogate':
+            # Every scored config is kept, as each one makes the model more accurate
+            population.extend(children)
+        else:
+            children = sorted(children, key=lambda config: config['fitness'])
+
+            population = population[-args.elite_count:]
+            children = children[-(args.population_count - args.elite_count):]
+            population.extend(children)
+        children = None
+        completed_generation = generation + 1
+        best_errors.append(min(config['mean_error'] for config in population))
+
+        checkpoint_state.update(generation=completed_generation, population=population, children=None)
+        save_checkpoint()
+
+    if stop_reason is not None:
+        print_message(f"")
+        print_message(f"Stopped early as {stop_reason}. Run again with --resume and different limits to carry on.")
 
-        population = population[-args.elite_count:]
-        children = children[-(args.population_count - args.elite_count):]
-        population.extend(children)
+    # Children which were scored before the run stopped part way through a generation are still worth showing
+    population = [config for config in population + (children or []) if 'fitness' in config]
+    if not population:
+        sys.exit('No configs were scored.')
 
     population = sorted(population, key=lambda config: config['fitness'])
     worst = population[0]
     best = population[-1]
     print_message(f"")
-    print_message(f"Generation {args.max_generation}/{args.max_generation}")
+    print_message(f"Generation {completed_generation}/{args.max_generation}")
     print_message(f"")
     print_message(f"  Worst Config")
     print_config(worst)
@@ -15,6 +15,7 @@ if __name__ == '__main__':
     parser.add_argument("-t", "--template-json", dest="template", required = True, help = 'Path to radio settings template json file.')
 
     parser.add_argument("-k", "--api-key", dest="key", required=True, help = "cloudrf.com API key.")
+    parser.add_argument("-u", "--base-url", dest="base_url", default="https://api.cloudrf.com/", help = "The base URL for the CloudRF API service.")
 
     parser.add_argument("-i", "--input-csv", dest="input", required = True, help = 'Path to input csv file containing transmitter positions. Expected headers are "lat", "lon", and "alt".')
     parser.add_argument("-o", "--output-csv", dest="output", required = True, help = 'Path to output csv file, where results will be written.')
@@ -47,7 +48,7 @@ if __name__ == '__main__':
     print()
 
     response = requests.post(
-        url = "https://api.cloudrf.com/points",
+        url = args.base_url.rstrip("/") + "/points",
         headers = {
             'key': args.key
         },
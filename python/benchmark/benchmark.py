@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from startup_budget import CLOUDRF_PATH, importTimes, wallTimeMilliseconds
+
+# Measures the throughput and memory use of CloudRF.py against the local mock server, so that changes to the hot paths show up with numbers
+#
+# Each scenario runs CloudRF.py as a separate process, the same way it is used from the command line:
+#   area        rows/s of an area CSV batch, which covers reading the CSV, building each request and saving each result
+#   points      points/s of a points CSV split into chunks with --max-points-per-request, which covers checking the CSV and merging
+#   download    MB/s and peak RSS while a large GeoTIFF is downloaded, which should stay flat however large the file is
+#   startup     milliseconds spent importing modules and starting the process for --help
+#
+# Results can be saved as a baseline and later runs compared against it. The mock server answers with a fixed latency, so the numbers
+# measure the client rather than the CloudRF API service, and are only comparable between runs on the same machine.
+
+MOCK_SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_server.py')
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(CLOUDRF_PATH)), 'templates', '5G', '5G-CBand-sector.json')
+
+# The mock server accepts any key, but CloudRF.py checks its format
+API_KEY = '101-' + 'a' * 40
+
+# Whether a higher value of each metric is better, used to tell a regression from an improvement
+METRICS = {
+    'area_rows_per_second': True,
+    'points_per_second': True,
+    'download_megabytes_per_second': True,
+    'download_peak_rss_megabytes': False,
+    'startup_import_milliseconds': False,
+    'startup_wall_milliseconds': False,
+}
+
+def compare(results, baseline, tolerance):
+    # Returns a line for each metric which is worse than the baseline by more than the tolerance
+    regressions = []
+
+    for metric, higherIsBetter in METRICS.items():
+        if metric not in results['metrics'] or metric not in baseline['metrics']:
+            continue
+
+        value = results['metrics'][metric]
+        baselineValue = baseline['metrics'][metric]
+        change = (value - baselineValue) / baselineValue if baselineValue else 0
+
+        if (-change if higherIsBetter else change) > tolerance:
+            regressions.append('%s: %.2f against a baseline of %.2f (%+.0f%%)' % (metric, value, baselineValue, change * 100))
+
+    return regressions
+
+def peakRssMegabytes(resourceUsage):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if sys.platform == 'darwin':
+        return resourceUsage.ru_maxrss / 1048576
+
+    return resourceUsage.ru_maxrss / 1024
+
+def runCloudRF(arguments, logPath):
+    # Returns the output of CloudRF.py and its peak RSS, which needs os.wait4 as subprocess does not report the resource usage of a child
+    with open(logPath, 'w') as logFile:
+        process = subprocess.Popen([sys.executable, CLOUDRF_PATH] + arguments, stdout = logFile, stderr = subprocess.STDOUT)
+        pid, status, resourceUsage = os.wait4(process.pid, 0)
+        # Stops Popen from trying to reap the process again, a process killed by a signal has a negative return code as with Popen.wait
+        # os.waitstatus_to_exitcode would do the same, but it needs Python 3.9
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+
+    with open(logPath) as logFile:
+        output = logFile.read()
+
+    # CloudRF.py always finishes through sys.exit, so a successful run is told apart by its last message rather than its exit code
+    if 'Process completed. Please check' not in output:
+        sys.exit('CloudRF.py %s failed:\n%s' % (' '.join(arguments), output[-2000:]))
+
+    return output, peakRssMegabytes(resourceUsage)
+
+def startMockServer(serverArguments):
+    # The mock server runs in its own process, as on Linux the peak RSS of a child process counts the memory of its parent when it was
+    # started. A server in this process would grow with each large GeoTIFF it made and be counted against CloudRF.py.
+    process = subprocess.Popen([sys.executable, MOCK_SERVER_PATH, '--port', '0'] + serverArguments, stdout = subprocess.PIPE, text = True)
+    baseUrl = process.stdout.readline().split()[-1]
+
+    return process, baseUrl
+
+def stopMockServer(process):
+    process.terminate()
+    process.wait()
+    process.stdout.close()
+
+def writeCsv(path, headers, rows):
+    with open(path, 'w') as csvFile:
+        csvFile.write(','.join(headers) + '\n')
+
+        for row in rows:
+            csvFile.write(','.join(str(value) for value in row) + '\n')
+
+def benchmarkArea(baseUrl, temporaryDirectory, arguments):
+    csvPath = os.path.join(temporaryDirectory, 'area.csv')
+    writeCsv(csvPath, ['transmitter.lat', 'transmitter.lon', 'output.rad'], [
+        (round(50 + random.uniform(-1, 1), 6), round(random.uniform(-1, 1), 6), 1) for row in range(arguments.rows)
+    ])
+
+    rowsPerSecond = []
+
+    for run in range(arguments.runs):
+        outputDirectory = tempfile.mkdtemp(dir = temporaryDirectory)
+        output, peakRss = runCloudRF([
+            'area', '-k', API_KEY, '-u', baseUrl, '-t', TEMPLATE_PATH, '-i', csvPath, '-o', outputDirectory,
+            '-c', str(arguments.concurrency), '-rl', '0', '-s', 'tiff',
+        ], os.path.join(temporaryDirectory, 'area.log'))
+
+        match = re.search(r'Completed \d+ CSV rows in [\d.]+ seconds \(([\d.]+) rows/s\)', output)
+        rowsPerSecond.append(float(match.group(1)))
+
+    return {'area_rows_per_second': statistics.median(rowsPerSecond)}
+
+def benchmarkPoints(baseUrl, temporaryDirectory, arguments):
+    csvPath = os.path.join(temporaryDirectory, 'points.csv')
+    writeCsv(csvPath, ['lat', 'lon', 'alt'], [
+        (round(50 + random.uniform(-0.1, 0.1), 6), round(random.uniform(-0.1, 0.1), 6), 2) for point in range(arguments.points)
+    ])
+
+    pointsPerSecond = []
+
+    for run in range(arguments.runs):
+        outputDirectory = tempfile.mkdtemp(dir = temporaryDirectory)
+        output, peakRss = runCloudRF([
+            'points', '-k', API_KEY, '-u', baseUrl, '-t', TEMPLATE_PATH, '-i', csvPath, '-o', outputDirectory,
+            '-c', str(arguments.concurrency), '-rl', '0', '-mp', str(arguments.points_per_request),
+        ], os.path.join(temporaryDirectory, 'points.log'))
+
+        match = re.search(r'Completed \d+ parts in ([\d.]+) seconds', output)
+        pointsPerSecond.append(arguments.points / max(float(match.group(1)), 0.01))
+
+    return {'points_per_second': statistics.median(pointsPerSecond)}
+
+def benchmarkDownload(temporaryDirectory, arguments):
+    # A single area calculation with its GeoTIFF made large by the mock server, timed by the download spans of the trace file
+    server, baseUrl = startMockServer(['--max-image-size', '256', '--tiff-scale', str(arguments.download_scale)])
+    megabytesPerSecond = []
+    peakRssValues = []
+
+    for run in range(arguments.runs):
+        outputDirectory = tempfile.mkdtemp(dir = temporaryDirectory)
+        tracePath = os.path.join(outputDirectory, 'trace.jsonl')
+        output, peakRss = runCloudRF([
+            'area', '-k', API_KEY, '-u', baseUrl, '-t', TEMPLATE_PATH, '-o', outputDirectory, '-rl', '0', '-s', 'tiff',
+            '--trace-file', tracePath,
+        ], os.path.join(temporaryDirectory, 'download.log'))
+
+        with open(tracePath) as traceFile:
+            spans = [json.loads(line) for line in traceFile]
+
+        # The mock server makes the GeoTIFF before it answers, so only the time spent reading the response and writing the file is counted
+        download = next(span for span in spans if span['name'] == 'download')
+        clientSeconds = download['phases'].get('download', 0) + download['phases'].get('disk', 0)
+        megabytesPerSecond.append(download['attributes']['file_bytes'] / 1048576 / max(clientSeconds, 0.001))
+        peakRssValues.append(peakRss)
+
+        # Keeps the temporary directory from growing by the size of the GeoTIFF on each run
+        os.remove(download['attributes']['path'])
+
+    stopMockServer(server)
+
+    return {
+        'download_megabytes_per_second': statistics.median(megabytesPerSecond),
+        'download_peak_rss_megabytes': max(peakRssValues),
+    }
+
+def benchmarkStartup(arguments):
+    bareModules = set(importTimes(['-c', 'pass']))
+    bareWallTime = statistics.median(wallTimeMilliseconds(['-c', 'pass']) for run in range(arguments.runs))
+
+    importMilliseconds = []
+
+    for run in range(arguments.runs):
+        moduleTimes = importTimes([CLOUDRF_PATH, 'area', '--help'])
+        importMilliseconds.append(sum(selfTime for moduleName, selfTime in moduleTimes.items() if moduleName not in bareModules) / 1000)
+
+    wallTime = statistics.median(wallTimeMilliseconds([CLOUDRF_PATH, 'area', '--help']) for run in range(arguments.runs))
+
+    return {
+        'startup_import_milliseconds': statistics.median(importMilliseconds),
+        'startup_wall_milliseconds': wallTime - bareWallTime,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Measure the throughput and memory use of CloudRF.py against a local mock server.')
+    parser.add_argument('--scenarios', dest = 'scenarios', nargs = '+', default = ['area', 'points', 'download', 'startup'], choices = ['area', 'points', 'download', 'startup'], help = 'Scenarios to run. (default: all)')
+    parser.add_argument('--runs', dest = 'runs', type = int, default = 3, help = 'Number of times each scenario is run, the median is used. (default: 3)')
+    parser.add_argument('--rows', dest = 'rows', type = int, default = 200, help = 'Number of rows in the area CSV. (default: 200)')
+    parser.add_argument('--points', dest = 'points', type = int, default = 20000, help = 'Number of rows in the points CSV. (default: 20000)')
+    parser.add_argument('--points-per-request', dest = 'points_per_request', type = int, default = 2000, help = 'Number of points sent in each request of the points CSV. (default: 2000)')
+    parser.add_argument('--concurrency', dest = 'concurrency', type = int, default = 4, help = 'Concurrency used for the area and points CSVs. (default: 4)')
+    parser.add_argument('--latency', dest = 'latency', type = float, default = 0.05, help = 'Seconds the mock server takes to answer each calculation. (default: 0.05)')
+    parser.add_argument('--download-scale', dest = 'download_scale', type = int, default = 32, help = 'Factor the 256 by 256 pixel GeoTIFF is scaled up by for the download scenario, 32 gives a file of 64 MB. (default: 32)')
+    parser.add_argument('--seed', dest = 'seed', type = int, default = 1, help = 'Seed for the CSV rows, so that every run sends the same requests. (default: 1)')
+    parser.add_argument('--save-baseline', dest = 'save_baseline', help = 'Path of a JSON file to save the results to, to be used as a baseline by later runs.')
+    parser.add_argument('--compare', dest = 'compare', help = 'Path of a baseline JSON file to compare the results against. Exits with an error if any metric has regressed.')
+    parser.add_argument('--tolerance', dest = 'tolerance', type = float, default = 0.2, help = 'Fraction by which a metric may be worse than the baseline before it is a regression. (default: 0.2)')
+    arguments = parser.parse_args()
+
+    random.seed(arguments.seed)
+
+    # Small output images keep the area scenario about the client rather than the time taken to make and save each image
+    server, baseUrl = startMockServer(['--latency', str(arguments.latency), '--max-image-size', '32'])
+    metrics = {}
+
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+        if 'area' in arguments.scenarios:
+            metrics.update(benchmarkArea(baseUrl, temporaryDirectory, arguments))
+
+        if 'points' in arguments.scenarios:
+            metrics.update(benchmarkPoints(baseUrl, temporaryDirectory, arguments))
+
+        if 'download' in arguments.scenarios:
+            metrics.update(benchmarkDownload(temporaryDirectory, arguments))
+
+    stopMockServer(server)
+
+    if 'startup' in arguments.scenarios:
+        metrics.update(benchmarkStartup(arguments))
+
+    results = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec = 'seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {key: value for key, value in vars(arguments).items() if key not in ['save_baseline', 'compare', 'tolerance']},
+        'metrics': {metric: round(metrics[metric], 2) for metric in METRICS if metric in metrics},
+    }
+
+    print('%-32s %12s' % ('metric', 'value'))
+
+    for metric, value in results['metrics'].items():
+        print('%-32s %12.2f' % (metric, value))
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, 'w') as baselineFile:
+            json.dump(results, baselineFile, indent = 4)
+            baselineFile.write('\n')
+
+        print('Baseline saved at %s' % arguments.save_baseline)
+
+    if arguments.compare:
+        with open(arguments.compare) as baselineFile:
+            baseline = json.load(baselineFile)
+
+        differentParameters = [
+            key for key, value in results['parameters'].items()
+            if key not in ['scenarios', 'runs'] and baseline.get('parameters', {}).get(key, value) != value
+        ]
+
+        if differentParameters:
+            print('The baseline was made with different values of %s, so the results may not be comparable.' % ', '.join(differentParameters))
+
+        regressions = compare(results, baseline, arguments.tolerance)
+
+        if regressions:
+            sys.exit('Regressions against the baseline (%s):\n%s' % (arguments.compare, '\n'.join(regressions)))
+
+        print('No metric regressed by more than %g%% against the baseline (%s).' % (arguments.tolerance * 100, arguments.compare))
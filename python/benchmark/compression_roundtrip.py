@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import argparse
+import filecmp
+import importlib.util
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.CloudRFClient import CloudRFClient
+from core.CloudRFRequest import CloudRFRequest
+from mock_server import startServer
+
+# Checks that compressed requests and downloads arrive intact, using the local mock server rather than the CloudRF API service
+#
+# A points request with many transmitters is sent with each type of compression. The server must receive the same JSON as was
+# sent, and compressed request bodies must be smaller on the wire. An output file is then downloaded with and without gzip
+# content encoding and both copies must be identical.
+
+def pointsRequest(count):
+    templateJson = {
+        'site': 'ROUNDTRIP',
+        'network': 'COMPRESSION',
+        'transmitter': {'lat': 51.5, 'lon': -2.5, 'alt': 10, 'frq': 868, 'txw': 0.1, 'bwi': 0.1},
+        'receiver': {'lat': 0, 'lon': 0, 'alt': 1, 'rxg': 2.15, 'rxs': -120},
+    }
+    points = [{'lat': 51.5 + index / 100000, 'lon': -2.5 + index / 100000, 'alt': 2} for index in range(count)]
+
+    return CloudRFRequest.points(templateJson = templateJson, points = points)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Check that compressed requests and downloads round-trip through a local mock server.')
+    parser.add_argument('--points', dest = 'points', type = int, default = 20000, help = 'Number of points in the request. (default: 20000)')
+    arguments = parser.parse_args()
+
+    server = startServer()
+    baseUrl = 'http://%s:%d' % server.server_address
+    request = pointsRequest(arguments.points)
+    failures = []
+
+    compressionTypes = [None, 'gzip']
+
+    if importlib.util.find_spec('zstandard') is not None:
+        compressionTypes.append('zstd')
+    else:
+        print('zstandard is not installed, skipping zstd.')
+
+    print('%-12s %14s %14s' % ('compression', 'JSON bytes', 'wire bytes'))
+
+    for compression in compressionTypes:
+        client = CloudRFClient(apiKey = 'mock', baseUrl = baseUrl, rateLimit = 0, compression = compression, compressionThreshold = 1024)
+        result = client.run(request)
+        client.close()
+
+        received = server.requests[-1]
+        print('%-12s %14d %14d' % (compression, received['bytes'], received['wireBytes']))
+
+        if received['json'] != request.jsonData:
+            failures.append('%s: the server did not receive the JSON which was sent.' % compression)
+
+        if received['contentEncoding'] != (compression or 'identity'):
+            failures.append('%s: the request was sent with a content encoding of %s.' % (compression, received['contentEncoding']))
+
+        if compression and received['wireBytes'] >= received['bytes']:
+            failures.append('%s: the request was not made any smaller.' % compression)
+
+        if len(result.response.get('Transmitters', [])) != arguments.points:
+            failures.append('%s: the response did not hold a result for every point.' % compression)
+
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+        # GeoTIFF files are not compressed already, so the server sends them gzip encoded
+        downloadUrl = result.response['kmz'][:-3] + 'tiff'
+
+        # The client only reports the content encoding of a download in its verbose log
+        messages = []
+        client = CloudRFClient(apiKey = 'mock', baseUrl = baseUrl, rateLimit = 0, verboseLog = messages.append)
+
+        encodedPath = client.downloadFile(downloadUrl, os.path.join(temporaryDirectory, 'encoded.tiff'))
+
+        client.session.headers['Accept-Encoding'] = 'identity'
+        identityPath = client.downloadFile(downloadUrl, os.path.join(temporaryDirectory, 'identity.tiff'))
+        client.close()
+
+        if not any('gzip content encoding' in message for message in messages):
+            failures.append('The download was not gzip encoded.')
+
+        if not filecmp.cmp(encodedPath, identityPath, shallow = False):
+            failures.append('The gzip encoded download does not match the download which was not encoded.')
+
+    server.shutdown()
+
+    if failures:
+        sys.exit('Compression round-trip failed:\n' + '\n'.join(failures))
+
+    print('Every request and download round-tripped intact.')
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import gzip
+import http.server
+import io
+import json
+import math
+import random
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+import zipfile
+import zlib
+
+# A local stand-in for the CloudRF API service, so that the clients can be checked and benchmarked without calling the paid service
+#
+# Every calculation endpoint used by the clients is implemented with the response shapes that they expect: area, path, points,
+# multisite, network, mesh and interference, the archive of output files at /archive/<sid>/<type> and the clutter profiles at
+# /API/clutter/index2.php. Output files are made up as they are downloaded: a GeoTIFF which can be opened with rasterio, a PNG and a
+# KMZ with the PNG as a ground overlay. Only the standard library is used, so the server runs anywhere the clients do.
+#
+# Signal levels come from free space path loss plus a loss for the clutter profile named by the request. This is not a propagation
+# model, it only makes sure that the same request always gives the same result and that the values of a clutter profile change it,
+# which is enough for area-calib.py to have something to calibrate against.
+#
+# Calculation requests may be sent with a Content-Encoding of gzip, or zstd when the zstandard module is installed. Output files which
+# are not already compressed are sent gzip encoded when the client says that it accepts gzip. A server started with startServer()
+# records every request received in the form it was decoded to, so that a caller running the server in the same process can check
+# what actually arrived.
+#
+#   python3 mock_server.py --port 8765 --latency 0.5 --error-rate 0.05
+#   python3 CloudRF.py area --base-url http://127.0.0.1:8765 ...
+
+CALCULATION_TYPES = ['area', 'interference', 'mesh', 'multisite', 'network', 'path', 'points']
+CLUTTER_PATH = 'API/clutter/index2.php'
+
+# Used for requests which have no transmitter of their own, such as mesh and interference
+DEFAULT_LATITUDE = 51.5
+DEFAULT_LONGITUDE = -2.5
+
+class MockCloudRFServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency = 0, jitter = 0, latencyPerPoint = 0, errorRate = 0, errorCodes = [429, 500, 503], retryAfter = 1, apiKey = None, maxImageSize = 256, tiffScale = 1, seed = None, recordRequests = False, verbose = False):
+        super().__init__(address, MockRequestHandler)
+
+        # Time in seconds that each calculation takes, plus up to the jitter and an amount for each point, transmitter or site
+        self.latency = latency
+        self.jitter = jitter
+        self.latencyPerPoint = latencyPerPoint
+
+        # The fraction of calculations which fail with one of the error codes, a HTTP 429 asks the client to wait for the retry after seconds
+        self.errorRate = errorRate
+        self.errorCodes = errorCodes
+        self.retryAfter = retryAfter
+
+        # Any API key is accepted when not set, but a request with no API key at all is always refused
+        self.apiKey = apiKey
+
+        # Output images are scaled down to no more than this many pixels across
+        self.maxImageSize = maxImageSize
+
+        # GeoTIFF files are scaled up by this factor in width and height, to make large downloads without making the signal any slower
+        self.tiffScale = tiffScale
+
+        self.requests = [] if recordRequests else None
+        self.verbose = verbose
+
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+
+        # The most recent calculations are kept so that their output files can be made when they are downloaded, as {sid: calculation}
+        self.__calculations = collections.OrderedDict()
+        self.__clutterProfiles = {}
+
+        self.calculationCount = 0
+        self.errorCount = 0
+
+    def calculation(self, sid):
+        with self.__lock:
+            return self.__calculations.get(sid)
+
+    def clutterProfile(self, name):
+        with self.__lock:
+            return self.__clutterProfiles.get(name, {})
+
+    def injectError(self):
+        # Returns the HTTP status code of an error to respond with, or None when the calculation should succeed
+        with self.__lock:
+            self.calculationCount += 1
+
+            if self.errorRate > 0 and self.__random.random() < self.errorRate:
+                self.errorCount += 1
+                return self.__random.choice(self.errorCodes)
+
+        return None
+
+    def latencySeconds(self, pointCount):
+        with self.__lock:
+            return self.latency + self.__random.uniform(0, self.jitter) + self.latencyPerPoint * pointCount
+
+    def recordRequest(self, record):
+        if self.requests is not None:
+            with self.__lock:
+                self.requests.append(record)
+
+    def saveCalculation(self, sid, calculation):
+        with self.__lock:
+            self.__calculations[sid] = calculation
+
+            while len(self.__calculations) > 4096:
+                self.__calculations.popitem(last = False)
+
+    def saveClutterProfile(self, name, profile):
+        with self.__lock:
+            self.__clutterProfiles[name] = profile
+
+class MockRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path.strip('/')
+        parts = path.split('/')
+
+        if len(parts) != 3 or parts[0] != 'archive':
+            self.__sendJson(404, {'error': 'Not found: %s' % self.path})
+            return
+
+        sid, fileType = parts[1], parts[2]
+        calculation = self.server.calculation(sid)
+
+        if calculation is None:
+            self.__sendJson(404, {'error': 'No calculation with an sid of %s.' % sid})
+            return
+
+        if fileType == 'tiff':
+            content, contentType, fileName = self.__geoTiff(calculation), 'image/tiff', sid + '.tiff'
+        elif fileType in ['png', 'png_mercator', 'chart']:
+            content, contentType, fileName = self.__png(calculation), 'image/png', sid + '.png'
+        elif fileType == 'kmz':
+            content, contentType, fileName = self.__kmz(calculation), 'application/vnd.google-earth.kmz', sid + '.kmz'
+        elif fileType == 'shp':
+            content, contentType, fileName = self.__shapefileArchive(sid), 'application/zip', sid + '.shp.zip'
+        else:
+            self.__sendJson(404, {'error': 'Unsupported file type of %s.' % fileType})
+            return
+
+        headers = {'Content-Disposition': 'attachment; filename="%s"' % fileName}
+
+        # Formats which are already compressed gain nothing from gzip
+        if contentType == 'image/tiff' and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content, compresslevel = 1)
+            headers['Content-Encoding'] = 'gzip'
+
+        self.__send(200, content, contentType, headers)
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        path = url.path.strip('/')
+        wireContent = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        contentEncoding = self.headers.get('Content-Encoding', 'identity')
+
+        try:
+            content = decode(wireContent, contentEncoding)
+
+            if path == CLUTTER_PATH:
+                requestJson = {key: values[-1] for key, values in urllib.parse.parse_qs(content.decode('utf-8')).items()}
+            else:
+                requestJson = json.loads(content) if content else None
+        except ValueError as e:
+            self.__sendJson(400, {'error': 'Unable to decode the %s request body: %s' % (contentEncoding, e)})
+            return
+
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+
+        self.server.recordRequest({
+            'path': path,
+            'requestType': path,
+            'contentEncoding': contentEncoding,
+            'wireBytes': len(wireContent),
+            'bytes': len(content),
+            'json': requestJson,
+            'params': params,
+        })
+
+        if path not in CALCULATION_TYPES and path != CLUTTER_PATH:
+            self.__sendJson(404, {'error': 'Not found: %s' % self.path})
+            return
+
+        apiKey = self.headers.get('key')
+
+        if apiKey is None or (self.server.apiKey is not None and apiKey != self.server.apiKey):
+            self.__sendJson(401, {'error': 'Invalid API key.'})
+            return
+
+        if path == CLUTTER_PATH:
+            self.__saveClutterProfile(requestJson)
+            return
+
+        if not isinstance(requestJson, dict):
+            requestJson = {}
+
+        pointCount = len(requestJson.get('points', requestJson.get('transmitters', [])))
+        time.sleep(self.server.latencySeconds(pointCount))
+
+        errorCode = self.server.injectError()
+
+        if errorCode is not None:
+            headers = {'Retry-After': str(self.server.retryAfter)} if errorCode == 429 else {}
+            self.__sendJson(errorCode, {'error': 'Injected HTTP %d error.' % errorCode}, headers)
+            return
+
+        self.__sendJson(200, self.__calculate(path, requestJson, params))
+
+    def log_message(self, format, *arguments):
+        if self.server.verbose:
+            super().log_message(format, *arguments)
+
+    def __archiveUrl(self, sid, fileType):
+        return 'http://%s:%d/archive/%s/%s' % (self.server.server_address[0], self.server.server_address[1], sid, fileType)
+
+    def __calculate(self, requestType, requestJson, params):
+        transmitter = requestJson.get('transmitter', {})
+
+        if requestType == 'multisite' and requestJson.get('transmitters'):
+            transmitter = requestJson['transmitters'][0]
+
+        calculation = {
+            'requestType': requestType,
+            'requestJson': requestJson,
+            'latitude': float(transmitter.get('lat', DEFAULT_LATITUDE)),
+            'longitude': float(transmitter.get('lon', DEFAULT_LONGITUDE)),
+            'radius': float(requestJson.get('output', {}).get('rad', 5)),
+            'resolution': float(requestJson.get('output', {}).get('res', 10)),
+            'clutterProfile': self.server.clutterProfile(str(requestJson.get('environment', {}).get('clt', '')).rsplit('.clt', 1)[0]),
+        }
+
+        if requestType == 'network':
+            # The network is made up of a few sites spread around the receiver
+            latitude, longitude = float(params.get('lat', DEFAULT_LATITUDE)), float(params.get('lon', DEFAULT_LONGITUDE))
+            sites = [(latitude + 0.01 * math.cos(angle), longitude + 0.01 * math.sin(angle)) for angle in [0, 2.1, 4.2]]
+
+            return [{'Transmitters': [{
+                'Latitude': siteLatitude,
+                'Longitude': siteLongitude,
+                'Signal power at receiver dBm': round(receivedPower(calculation, siteLatitude, siteLongitude, latitude, longitude), 1),
+            }]} for siteLatitude, siteLongitude in sites]
+
+        sid = uuid.uuid4().hex[:12]
+        self.server.saveCalculation(sid, calculation)
+
+        north, south, east, west = bounds(calculation)
+        response = {
+            'sid': sid,
+            'kmz': self.__archiveUrl(sid, 'kmz'),
+            'elapsed': 0,
+            'bounds': [north, east, south, west],
+        }
+
+        if requestType in ['area', 'interference', 'multisite']:
+            response['PNG_WGS84'] = self.__archiveUrl(sid, 'png')
+            response['PNG_Mercator'] = self.__archiveUrl(sid, 'png_mercator')
+        elif requestType == 'mesh':
+            response['png_wgs84'] = self.__archiveUrl(sid, 'png')
+            response['png_mercator'] = self.__archiveUrl(sid, 'png_mercator')
+        elif requestType == 'path':
+            receiver = requestJson.get('receiver', {})
+            response['Chart image'] = self.__archiveUrl(sid, 'chart')
+            response['Receiver'] = [{
+                'Latitude': receiver.get('lat'),
+                'Longitude': receiver.get('lon'),
+                'Signal power at receiver dBm': round(receivedPower(calculation, calculation['latitude'], calculation['longitude'], float(receiver.get('lat', 0)), float(receiver.get('lon', 0))), 1),
+            }]
+        elif requestType == 'points':
+            receiver = requestJson.get('receiver', {})
+            receiverLatitude, receiverLongitude = float(receiver.get('lat', 0)), float(receiver.get('lon', 0))
+            response['Transmitters'] = []
+
+            for server, point in enumerate(requestJson.get('points', []), start = 1):
+                pointLatitude, pointLongitude = float(point.get('lat', 0)), float(point.get('lon', 0))
+                distance = distanceKm(pointLatitude, pointLongitude, receiverLatitude, receiverLongitude)
+                power = receivedPower(calculation, pointLatitude, pointLongitude, receiverLatitude, receiverLongitude)
+
+                response['Transmitters'].append({
+                    'server': server,
+                    'Latitude': pointLatitude,
+                    'Longitude': pointLongitude,
+                    'Antenna height m': point.get('alt', transmitter.get('alt')),
+                    'Distance to receiver km': round(distance, 3),
+                    'Computed path loss dB': round(eirpDbm(requestJson) - power, 1),
+                    'Signal power at receiver dBm': round(power, 1),
+                })
+
+        return response
+
+    def __geoTiff(self, calculation):
+        width, height, pixels = signalGrid(calculation, self.server.maxImageSize)
+        north, south, east, west = bounds(calculation)
+
+        if self.server.tiffScale > 1:
+            width, height, pixels = upscale(width, height, pixels, self.server.tiffScale)
+
+        return geoTiff(width, height, pixels, west, north, (east - west) / width, (north - south) / height)
+
+    def __kmz(self, calculation):
+        north, south, east, west = bounds(calculation)
+        kml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<kml xmlns="http://www.opengis.net/kml/2.2"><GroundOverlay><name>%s</name><Icon><href>overlay.png</href></Icon>'
+            '<LatLonBox><north>%f</north><south>%f</south><east>%f</east><west>%f</west></LatLonBox></GroundOverlay></kml>\n'
+        ) % (calculation['requestType'], north, south, east, west)
+
+        archive = io.BytesIO()
+
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as kmzFile:
+            kmzFile.writestr('doc.kml', kml)
+            kmzFile.writestr('overlay.png', self.__png(calculation))
+
+        return archive.getvalue()
+
+    def __png(self, calculation):
+        width, height, pixels = signalGrid(calculation, self.server.maxImageSize)
+        return png(width, height, pixels)
+
+    def __saveClutterProfile(self, formData):
+        # Each line is in the form of code:height:attenuation, optionally followed by a name and colour
+        name = formData.get('save')
+
+        if not name:
+            self.__sendJson(200, {'status': 400, 'message': 'No clutter profile name was given.'})
+            return
+
+        profile = {}
+
+        try:
+            for line in formData.get('values', '').splitlines():
+                if line.strip():
+                    code, height, attenuation = line.split(':')[:3]
+                    profile[int(code)] = (float(height), float(attenuation))
+        except ValueError:
+            self.__sendJson(200, {'status': 400, 'message': 'Invalid clutter profile line: %s' % line})
+            return
+
+        self.server.saveClutterProfile(name, profile)
+        self.__sendJson(200, {'status': 200, 'message': 'Clutter profile %s saved.' % name})
+
+    def __send(self, statusCode, content, contentType, headers = {}):
+        self.send_response(statusCode)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(content)))
+
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(content)
+
+    def __sendJson(self, statusCode, responseJson, headers = {}):
+        self.__send(statusCode, json.dumps(responseJson).encode('utf-8'), 'application/json', headers)
+
+    def __shapefileArchive(self, sid):
+        # Only the projection is included, which is enough for a client which saves the file without reading it
+        archive = io.BytesIO()
+
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as shapefileArchive:
+            shapefileArchive.writestr(sid + '.prj', 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]')
+
+        return archive.getvalue()
+
+def bounds(calculation):
+    # Returns the north, south, east and west of the output of a calculation, which is a square of the radius around the transmitter
+    latitudeRadius = calculation['radius'] / 111.32
+    longitudeRadius = calculation['radius'] / (111.32 * max(0.01, math.cos(math.radians(calculation['latitude']))))
+
+    return calculation['latitude'] + latitudeRadius, calculation['latitude'] - latitudeRadius, calculation['longitude'] + longitudeRadius, calculation['longitude'] - longitudeRadius
+
+def decode(content, contentEncoding):
+    # A body which can not be decoded raises a ValueError
+    if contentEncoding in ['identity', '']:
+        return content
+
+    if contentEncoding == 'gzip':
+        try:
+            return gzip.decompress(content)
+        except (EOFError, OSError) as e:
+            raise ValueError(e)
+
+    if contentEncoding == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError('zstd is not supported as the zstandard module is not installed.')
+
+        try:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+        except zstandard.ZstdError as e:
+            raise ValueError(e)
+
+    raise ValueError('Unsupported content encoding.')
+
+def distanceKm(latitude1, longitude1, latitude2, longitude2):
+    # An equirectangular approximation, which is close enough over the radius of a calculation
+    x = math.radians(longitude2 - longitude1) * math.cos(math.radians((latitude1 + latitude2) / 2))
+    y = math.radians(latitude2 - latitude1)
+
+    return 6371 * math.hypot(x, y)
+
+def eirpDbm(requestJson):
+    transmitter = requestJson.get('transmitter', {})
+    antenna = requestJson.get('antenna', {})
+    receiver = requestJson.get('receiver', {})
+
+    power = float(transmitter.get('txw', 1))
+    powerDbm = power if transmitter.get('powerUnit') == 'dBm' else 10 * math.log10(max(power, 1e-9) * 1000)
+
+    return powerDbm + float(antenna.get('txg', 0)) - float(antenna.get('txl', 0)) + float(receiver.get('rxg', 0))
+
+def geoTiff(width, height, pixels, west, north, pixelWidth, pixelHeight):
+    # A single band, 8 bit, uncompressed GeoTIFF in WGS84, with the image in one strip straight after the header
+    tags = [
+        (256, 4, [width]),                      # ImageWidth
+        (257, 4, [height]),                     # ImageLength
+        (258, 3, [8]),                          # BitsPerSample
+        (259, 3, [1]),                          # Compression, none
+        (262, 3, [1]),                          # PhotometricInterpretation, black is zero
+        (273, 4, [8]),                          # StripOffsets
+        (277, 3, [1]),                          # SamplesPerPixel
+        (278, 4, [height]),                     # RowsPerStrip
+        (279, 4, [len(pixels)]),                # StripByteCounts
+        (284, 3, [1]),                          # PlanarConfiguration
+        (33550, 12, [pixelWidth, pixelHeight, 0.0]),                       # ModelPixelScale
+        (33922, 12, [0.0, 0.0, 0.0, west, north, 0.0]),                    # ModelTiepoint
+        (34735, 3, [1, 1, 0, 3, 1024, 0, 1, 2, 1025, 0, 1, 1, 2048, 0, 1, 4326]),  # GeoKeyDirectory, geographic WGS84
+    ]
+    formats = {3: 'H', 4: 'I', 12: 'd'}
+
+    ifdOffset = 8 + len(pixels) + len(pixels) % 2
+    extraOffset = ifdOffset + 2 + 12 * len(tags) + 4
+    entries = b''
+    extra = b''
+
+    for tag, fieldType, values in tags:
+        packedValues = struct.pack('<%d%s' % (len(values), formats[fieldType]), *values)
+
+        if len(packedValues) <= 4:
+            entries += struct.pack('<HHI', tag, fieldType, len(values)) + packedValues.ljust(4, b'\0')
+        else:
+            entries += struct.pack('<HHII', tag, fieldType, len(values), extraOffset + len(extra))
+            extra += packedValues
+
+    return b'II*\0' + struct.pack('<I', ifdOffset) + pixels + b'\0' * (len(pixels) % 2) + struct.pack('<H', len(tags)) + entries + struct.pack('<I', 0) + extra
+
+def png(width, height, pixels):
+    # Pixels with a signal are red, getting brighter as the signal gets stronger, anything else is transparent
+    rows = b''.join(
+        b'\0' + b''.join(bytes((255 - value, 0, 0, 255)) if value else b'\0\0\0\0' for value in pixels[row * width:(row + 1) * width])
+        for row in range(height)
+    )
+
+    def chunk(chunkType, data):
+        return struct.pack('>I', len(data)) + chunkType + data + struct.pack('>I', zlib.crc32(chunkType + data))
+
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+def receivedPower(calculation, transmitterLatitude, transmitterLongitude, receiverLatitude, receiverLongitude):
+    requestJson = calculation['requestJson']
+    model = requestJson.get('model', {})
+    frequency = float(requestJson.get('transmitter', {}).get('frq', 868))
+    distance = max(0.001, distanceKm(transmitterLatitude, transmitterLongitude, receiverLatitude, receiverLongitude))
+
+    # Free space path loss
+    loss = 32.44 + 20 * math.log10(distance) + 20 * math.log10(max(frequency, 1))
+
+    # Clutter gets worse with distance, trees by their height as well as their attenuation
+    buildingHeight, buildingAttenuation = calculation['clutterProfile'].get(99, (0, 0))
+    treeHeight, treeAttenuation = calculation['clutterProfile'].get(2, (0, 0))
+    loss += distance * (2 * buildingAttenuation + 0.5 * treeAttenuation * treeHeight)
+
+    # The model settings which area-calib.py varies
+    loss += 3 * (int(model.get('pe', 1)) - 1) + 0.1 * (float(model.get('rel', 50)) - 50)
+
+    # A repeatable ripple so that the signal is not perfectly smooth
+    loss += 3 * (1 + math.sin(receiverLatitude * 900) * math.cos(receiverLongitude * 700))
+
+    return eirpDbm(requestJson) - loss
+
+def signalGrid(calculation, maxImageSize):
+    # Returns the width, height and pixels of the output image, each pixel being the signal as a positive number of -dBm or 0 for no signal
+    north, south, east, west = bounds(calculation)
+    size = max(1, min(maxImageSize, int(math.ceil(2000 * calculation['radius'] / max(calculation['resolution'], 1)))))
+    sensitivity = float(calculation['requestJson'].get('receiver', {}).get('rxs', -140))
+
+    pixels = bytearray(size * size)
+
+    for row in range(size):
+        latitude = north - (row + 0.5) * (north - south) / size
+
+        for column in range(size):
+            longitude = west + (column + 0.5) * (east - west) / size
+
+            if distanceKm(calculation['latitude'], calculation['longitude'], latitude, longitude) > calculation['radius']:
+                continue
+
+            power = receivedPower(calculation, calculation['latitude'], calculation['longitude'], latitude, longitude)
+
+            if power >= sensitivity:
+                pixels[row * size + column] = min(255, max(1, int(round(-power))))
+
+    return size, size, bytes(pixels)
+
+def upscale(width, height, pixels, scale):
+    # Repeats each pixel as a scale by scale block
+    rows = []
+
+    for row in range(height):
+        scaledRow = b''.join(bytes([pixel]) * scale for pixel in pixels[row * width:(row + 1) * width])
+        rows.append(scaledRow * scale)
+
+    return width * scale, height * scale, b''.join(rows)
+
+def startServer(host = '127.0.0.1', port = 0, **serverArguments):
+    # Runs the server on a background thread and returns it, a port of 0 uses any free port
+    server = MockCloudRFServer((host, port), recordRequests = True, **serverArguments)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'A local stand-in for the CloudRF API service.')
+    parser.add_argument('--host', dest = 'host', default = '127.0.0.1', help = 'Address to listen on. (default: 127.0.0.1)')
+    parser.add_argument('--port', dest = 'port', type = int, default = 8765, help = 'Port to listen on. (default: 8765)')
+    parser.add_argument('--latency', dest = 'latency', type = float, default = 0, help = 'Time in seconds that each calculation takes. (default: 0)')
+    parser.add_argument('--jitter', dest = 'jitter', type = float, default = 0, help = 'Up to this many seconds are added at random to the latency of each calculation. (default: 0)')
+    parser.add_argument('--latency-per-point', dest = 'latency_per_point', type = float, default = 0, help = 'Time in seconds added to a calculation for each of its points or transmitters. (default: 0)')
+    parser.add_argument('--error-rate', dest = 'error_rate', type = float, default = 0, help = 'Fraction of calculations, from 0 to 1, which fail with one of the --error-codes. (default: 0)')
+    parser.add_argument('--error-codes', dest = 'error_codes', type = int, nargs = '+', default = [429, 500, 503], help = 'HTTP status codes used for failed calculations. (default: 429 500 503)')
+    parser.add_argument('--retry-after', dest = 'retry_after', type = int, default = 1, help = 'Seconds sent in the Retry-After header of a HTTP 429. (default: 1)')
+    parser.add_argument('--api-key', dest = 'api_key', default = None, help = 'The only API key which is accepted. Any API key is accepted when not set. (default: None)')
+    parser.add_argument('--max-image-size', dest = 'max_image_size', type = int, default = 256, help = 'Maximum width and height in pixels of output images. (default: 256)')
+    parser.add_argument('--tiff-scale', dest = 'tiff_scale', type = int, default = 1, help = 'Factor by which the width and height of GeoTIFF files are scaled up, to test large downloads. (default: 1)')
+    parser.add_argument('--seed', dest = 'seed', type = int, default = None, help = 'Seed for the latency jitter and errors, so that a run can be repeated. (default: None)')
+    parser.add_argument('-v', '--verbose', action = 'store_true', default = False, help = 'Log every request received.')
+    arguments = parser.parse_args()
+
+    if not 0 <= arguments.error_rate <= 1:
+        sys.exit('Your error rate value (%g) must be between 0 and 1.' % arguments.error_rate)
+
+    server = MockCloudRFServer(
+        (arguments.host, arguments.port),
+        latency = arguments.latency,
+        jitter = arguments.jitter,
+        latencyPerPoint = arguments.latency_per_point,
+        errorRate = arguments.error_rate,
+        errorCodes = arguments.error_codes,
+        retryAfter = arguments.retry_after,
+        apiKey = arguments.api_key,
+        maxImageSize = arguments.max_image_size,
+        tiffScale = arguments.tiff_scale,
+        seed = arguments.seed,
+        verbose = arguments.verbose,
+    )
+    print('Mock CloudRF API service listening on http://%s:%d' % server.server_address, flush = True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Checks that CloudRF.py starts quickly, for use in CI or before a release
+#
+# Each request type is run with --help under "python -X importtime". The time spent importing modules on top of a bare interpreter
+# must stay within the budget, and modules which are only needed to make requests must not be imported at all.
+
+CLOUDRF_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CloudRF.py')
+
+# Modules which are slow to import and are only needed once a request is made
+FORBIDDEN_MODULES = ['concurrent.futures', 'csv', 'hashlib', 'requests', 'shutil', 'urllib3', 'uuid']
+
+REQUEST_TYPES = ['area', 'interference', 'mesh', 'multisite', 'network', 'path', 'points']
+
+def importTimes(arguments):
+    # Returns the self time in microseconds of each module which was imported
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + arguments, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True)
+    moduleTimes = {}
+
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        selfTime, cumulativeTime, moduleName = line[len('import time:'):].split('|')
+        moduleTimes[moduleName.strip()] = int(selfTime)
+
+    return moduleTimes
+
+def wallTimeMilliseconds(arguments):
+    startTime = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    return (time.perf_counter() - startTime) * 1000
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Check the startup time of CloudRF.py against a budget.')
+    parser.add_argument('--budget-ms', dest = 'budget_ms', type = float, default = 30, help = 'Maximum time in milliseconds spent importing modules on top of a bare interpreter. (default: 30)')
+    parser.add_argument('--runs', dest = 'runs', type = int, default = 5, help = 'Number of times each request type is started, the median is used. (default: 5)')
+    parser.add_argument('--request-types', dest = 'request_types', nargs = '+', default = REQUEST_TYPES, choices = REQUEST_TYPES, help = 'Request types to check. (default: all)')
+    arguments = parser.parse_args()
+
+    # Anything imported by the interpreter itself, such as site, is not counted against the budget
+    bareModules = set(importTimes(['-c', 'pass']))
+    bareWallTime = statistics.median(wallTimeMilliseconds(['-c', 'pass']) for run in range(arguments.runs))
+
+    failures = []
+
+    print('%-13s %12s %12s %10s' % ('request type', 'imports ms', 'wall ms', 'modules'))
+
+    for requestType in arguments.request_types:
+        importMilliseconds = []
+        forbiddenModules = set()
+
+        for run in range(arguments.runs):
+            moduleTimes = importTimes([CLOUDRF_PATH, requestType, '--help'])
+            addedModules = {moduleName: selfTime for moduleName, selfTime in moduleTimes.items() if moduleName not in bareModules}
+
+            importMilliseconds.append(sum(addedModules.values()) / 1000)
+            forbiddenModules.update(
+                forbiddenModule for forbiddenModule in FORBIDDEN_MODULES
+                if any(moduleName == forbiddenModule or moduleName.startswith(forbiddenModule + '.') for moduleName in addedModules)
+            )
+
+        medianImportMilliseconds = statistics.median(importMilliseconds)
+        medianWallTime = statistics.median(wallTimeMilliseconds([CLOUDRF_PATH, requestType, '--help']) for run in range(arguments.runs))
+
+        print('%-13s %12.1f %12.1f %10d' % (requestType, medianImportMilliseconds, medianWallTime - bareWallTime, len(addedModules)))
+
+        if medianImportMilliseconds > arguments.budget_ms:
+            failures.append('%s: %.1f ms spent importing modules, over the budget of %g ms.' % (requestType, medianImportMilliseconds, arguments.budget_ms))
+
+        if forbiddenModules:
+            failures.append('%s: imported %s, which should only be imported once a request is made.' % (requestType, ', '.join(sorted(forbiddenModules))))
+
+    if failures:
+        sys.exit('Startup budget exceeded:\n' + '\n'.join(failures))
+
+    print('All request types started within the budget of %g ms.' % arguments.budget_ms)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+from core.CloudRFClient import CloudRFClient
+from core.CloudRFRequest import CloudRFRequest
+
+# An asyncio client for the CloudRF API service, for use from inside an event loop such as an asyncio service
+#
+# Requests are made by a CloudRFClient on a pool of worker threads, so the event loop is never blocked and no extra dependencies are needed.
+# No more than the given concurrency of requests are in flight at once, and every request shares the same rate limiter and connections.
+# When a request is cancelled or times out its worker stops at the next chance it gets, a calculation which has already been sent
+# is not retried and a download in progress is stopped between chunks.
+#
+#   async with AsyncCloudRFClient(apiKey = '...', concurrency = 8, timeout = 120) as client:
+#       results = await client.calculateMany('area', listOfRequestJson)
+class AsyncCloudRFClient:
+    def __init__(self, apiKey, concurrency = 8, timeout = None, **clientArguments):
+        self.concurrency = max(1, int(concurrency))
+
+        # Used for any request which is not given its own timeout, None means no timeout
+        self.timeout = timeout
+
+        clientArguments.setdefault('poolSize', max(10, self.concurrency))
+        self.client = CloudRFClient(apiKey = apiKey, **clientArguments)
+
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers = self.concurrency, thread_name_prefix = 'cloudrf')
+
+        # Created on first use so that it belongs to the running event loop
+        self.__semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exceptionType, exceptionValue, traceback):
+        await self.close()
+
+    async def area(self, jsonData, timeout = None):
+        return await self.run(CloudRFRequest.area(templateJson = jsonData), timeout = timeout)
+
+    async def calculate(self, requestType, jsonData = None, params = None, timeout = None):
+        # Returns a CloudRFResult, a response which is not a HTTP 200 raises a CloudRFHttpError
+        return await self.run(self.__request(requestType, jsonData, params), timeout = timeout)
+
+    async def calculateMany(self, requestType, jsonDataIterable, timeout = None, returnExceptions = True):
+        # Results are returned in the same order as the requests, a request which fails has its exception in place of its result
+        return await asyncio.gather(
+            *(self.calculate(requestType, jsonData = jsonData, timeout = timeout) for jsonData in jsonDataIterable),
+            return_exceptions = returnExceptions
+        )
+
+    async def close(self):
+        # The worker threads are waited for off the event loop, so none of them are still using the session once it is closed
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.__executor.shutdown, wait = True))
+        self.client.close()
+
+    async def download(self, url, savePath, timeout = None):
+        # Returns the path the file was saved to, which may have a different extension to the one asked for
+        return await self.__run(self.client.downloadFile, timeout, url, savePath)
+
+    async def downloadOutputFiles(self, result, saveBasePath, fileTypes = None, timeout = None):
+        # Every output file type of the request is downloaded when no file types are given, the paths are added to the files of the result
+        return await self.__run(self.client.downloadOutputFiles, timeout, result, saveBasePath, fileTypes)
+
+    async def interference(self, networkName, jammerNetworkName, name = None, timeout = None):
+        return await self.run(CloudRFRequest.interference(networkName = networkName, jammerNetworkName = jammerNetworkName, name = name), timeout = timeout)
+
+    async def mesh(self, networkName, timeout = None):
+        return await self.run(CloudRFRequest.mesh(networkName = networkName), timeout = timeout)
+
+    async def multisite(self, jsonData, timeout = None):
+        return await self.calculate('multisite', jsonData = jsonData, timeout = timeout)
+
+    async def network(self, networkName, latitude, longitude, altitude, timeout = None):
+        return await self.run(CloudRFRequest.network(networkName = networkName, latitude = latitude, longitude = longitude, altitude = altitude), timeout = timeout)
+
+    async def path(self, jsonData, timeout = None):
+        return await self.run(CloudRFRequest.path(templateJson = jsonData), timeout = timeout)
+
+    async def points(self, jsonData, timeout = None):
+        return await self.calculate('points', jsonData = jsonData, timeout = timeout)
+
+    async def run(self, request, timeout = None):
+        # Run a CloudRFRequest, such as one made by a CloudRFRequest builder, and return its CloudRFResult
+        return await self.__run(self.client.run, timeout, request)
+
+    def __request(self, requestType, jsonData, params):
+        # Requests go through the builder for their type, so they are checked in the same way as with CloudRF.py, such as an area
+        # request having its receiver location cleared. The other builders only take names, which make the same request as given here.
+        if requestType == 'area':
+            return CloudRFRequest.area(templateJson = jsonData)
+        elif requestType == 'multisite':
+            return CloudRFRequest.multisite(templateJson = jsonData, transmitters = jsonData.get('transmitters', []))
+        elif requestType == 'path':
+            return CloudRFRequest.path(templateJson = jsonData)
+        elif requestType == 'points':
+            # The transmitter location defaults to the very first point when the request does not have one
+            transmitter = jsonData.get('transmitter', {})
+            return CloudRFRequest.points(templateJson = jsonData, points = jsonData.get('points', []), transmitter = transmitter if 'lat' in transmitter and 'lon' in transmitter else None)
+        else:
+            return CloudRFRequest(requestType, jsonData = jsonData, params = params)
+
+    async def __run(self, function, timeout, *arguments):
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.concurrency)
+
+        # Lets the worker thread know that nobody is waiting for it any more
+        cancelEvent = threading.Event()
+
+        async with self.__semaphore:
+            future = asyncio.get_running_loop().run_in_executor(self.__executor, functools.partial(function, *arguments, cancelEvent = cancelEvent))
+
+            try:
+                return await asyncio.wait_for(future, timeout = timeout if timeout is not None else self.timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                cancelEvent.set()
+                raise
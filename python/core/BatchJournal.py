@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+
+from core.CanonicalHash import CanonicalHash
+from core.JsonSerializer import JsonSerializer
+
+# An append-only record of each CSV row in a batch, used to pick up a long batch where it left off after a crash
+#
+# Each line of the journal is a single JSON event for a row, keyed by a hash of the request which was made for that row.
+# Events are folded together when the journal is loaded, so the latest state of each row wins.
+class BatchJournal:
+    STATUS_CALCULATED = 'calculated'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, path):
+        self.path = path
+
+        # The journal as it was when it was opened, new events are only appended to the file
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            self.__load()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, rowHash):
+        with self.__lock:
+            return self.__entries.get(rowHash)
+
+    def recordArtifact(self, rowHash, fileType, paths):
+        self.__append({
+            'event': 'artifact',
+            'hash': rowHash,
+            'file_type': fileType,
+            'paths': paths
+        })
+
+    def recordCalculated(self, rowHash, rowNumber, requestName, saveBasePath, response):
+        self.__append({
+            'event': self.STATUS_CALCULATED,
+            'hash': rowHash,
+            'row': rowNumber,
+            'request_name': requestName,
+            'save_base_path': saveBasePath,
+            'sid': response.get('sid') if isinstance(response, dict) else None,
+            'response': response
+        })
+
+    def recordFailed(self, rowHash, rowNumber, requestName, message):
+        self.__append({
+            'event': self.STATUS_FAILED,
+            'hash': rowHash,
+            'row': rowNumber,
+            'request_name': requestName,
+            'message': message
+        })
+
+    def rowHash(requestType, jsonData):
+        return CanonicalHash.sha256({'type': requestType, 'request': jsonData})
+
+    def __append(self, record):
+        # Only rows from earlier runs are looked up, so rows from this run are written to disk but not kept in memory
+        with self.__lock:
+            # Flushed after every event so that a crash loses at most the event being written
+            # Each event holds the whole response for its row, which can be large for points and multisite requests
+            with open(self.path, 'ab') as journalFile:
+                journalFile.write(JsonSerializer.dumps(record) + b'\n')
+                journalFile.flush()
+
+    def __apply(self, record):
+        rowHash = record['hash']
+
+        if record['event'] == 'artifact':
+            entry = self.__entries.setdefault(rowHash, {'status': None, 'artifacts': {}})
+            entry['artifacts'][record['file_type']] = record['paths']
+        elif record['event'] == self.STATUS_CALCULATED:
+            # A new calculation replaces any artifacts from an earlier calculation of the same row
+            self.__entries[rowHash] = {
+                'status': self.STATUS_CALCULATED,
+                'row': record['row'],
+                'request_name': record['request_name'],
+                'save_base_path': record['save_base_path'],
+                'sid': record['sid'],
+                'response': record['response'],
+                'artifacts': {}
+            }
+        elif record['event'] == self.STATUS_FAILED:
+            entry = self.__entries.get(rowHash)
+
+            # A row which was calculated before is still usable, even if a later attempt at it failed
+            if not entry or entry['status'] != self.STATUS_CALCULATED:
+                self.__entries[rowHash] = {
+                    'status': self.STATUS_FAILED,
+                    'row': record['row'],
+                    'request_name': record['request_name'],
+                    'message': record['message'],
+                    'artifacts': {}
+                }
+
+    def __load(self):
+        # Where the last line which ended with a newline finished, anything after it was cut short when the process was killed
+        completeBytes = 0
+        tailIsRecord = False
+
+        with open(self.path, 'rb') as journalFile:
+            for line in journalFile:
+                if line.endswith(b'\n'):
+                    completeBytes += len(line)
+
+                if not line.strip():
+                    continue
+
+                try:
+                    record = JsonSerializer.loads(line)
+                except ValueError:
+                    # The last line may have only been partly written if the process was killed
+                    tailIsRecord = False
+                    continue
+
+                tailIsRecord = True
+                self.__apply(record)
+
+        if completeBytes == os.path.getsize(self.path):
+            return
+
+        # The next event must start on a line of its own, otherwise it would be appended to the cut off line and lost along with it.
+        # A record which was only missing its newline is kept, anything else is removed.
+        with open(self.path, 'r+b') as journalFile:
+            if tailIsRecord:
+                journalFile.seek(0, os.SEEK_END)
+                journalFile.write(b'\n')
+            else:
+                journalFile.truncate(completeBytes)
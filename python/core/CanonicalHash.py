@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+
+# A hash of JSON data which does not depend on the order of its keys, used to recognise the same request across runs
+#
+# The json module is used rather than JsonSerializer, as the output must be byte for byte the same whichever backend is installed.
+class CanonicalHash:
+    def sha256(data):
+        # Keys are sorted so that the same request always has the same hash, no matter the order of the template or CSV
+        canonicalJson = json.dumps(data, sort_keys = True, separators = (',', ':'))
+        return hashlib.sha256(canonicalJson.encode('utf-8')).hexdigest()
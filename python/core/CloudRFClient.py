@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+
+import contextlib
+import os
+import random
+import re
+import requests
+import time
+import uuid
+
+from core.CloudRFError import CloudRFAuthenticationError, CloudRFCancelledError, CloudRFConnectionError, CloudRFHttpError, CloudRFSslError, CloudRFValidationError
+from core.CloudRFRequest import CloudRFRequest
+from core.CloudRFResult import CloudRFResult
+from core.JsonSerializer import JsonSerializer
+from core.RateLimiter import RateLimiter
+from core.RequestTracer import RequestTracer
+
+# The HTTP side of the CloudRF API service, shared by the CLI and by AsyncCloudRFClient
+#
+# A single session is used for every calculation and download so that connections are reused. Calculations are sent through
+# a rate limiter which is shared by every thread using the client, and transient failures are retried with backoff and jitter.
+# The client is safe to use from several threads at once, and never exits the process. Errors are raised as one of the types in CloudRFError.
+#
+#   client = CloudRFClient(apiKey = '...')
+#   result = client.run(CloudRFRequest.area(templateJson))
+#   client.downloadOutputFiles(result, saveBasePath = '/home/user/output/my-area', fileTypes = ['kmz'])
+class CloudRFClient:
+    COMPRESSION_TYPES = ['gzip', 'zstd']
+    RETRYABLE_HTTP_STATUS_CODES = [429, 500, 502, 503, 504]
+
+    def __init__(self, apiKey, baseUrl = 'https://api.cloudrf.com/', strictSsl = True, rateLimit = 1, burst = 1, maxRetries = 3, retryBackoff = 1, retryMaxBackoff = 60, poolSize = 10, poolHosts = 4, keepAlive = True, downloadChunkSize = 1048576, timeout = None, compression = None, compressionThreshold = 65536, tracer = None, log = None, verboseLog = None):
+        self.apiKey = apiKey
+        self.baseUrl = str(baseUrl).rstrip('/')
+        self.maxRetries = maxRetries
+        self.retryBackoff = retryBackoff
+        self.retryMaxBackoff = retryMaxBackoff
+        self.downloadChunkSize = downloadChunkSize
+        self.timeout = timeout
+
+        # Request bodies of at least the threshold in bytes are compressed, None sends every request body as it is
+        self.compression = compression
+        self.compressionThreshold = compressionThreshold
+
+        if compression is not None and compression not in self.COMPRESSION_TYPES:
+            raise CloudRFValidationError('Unsupported compression of "%s" being used. Allowed compression types are: %s' % (compression, self.COMPRESSION_TYPES))
+
+        if compression == 'zstd':
+            try:
+                import zstandard
+                self.__zstandard = zstandard
+            except ImportError:
+                raise CloudRFValidationError('zstd compression was asked for, but zstandard is not installed. Please install it with "pip install zstandard".')
+
+        # A RequestTracer which records the phases of every calculation and download, None when they are not traced
+        self.tracer = tracer
+
+        # Messages about retries are always logged, other messages only when verbose logging is given
+        self.__log = log if log else (lambda message: None)
+        self.__verboseLog = verboseLog if verboseLog else (lambda message: None)
+
+        self.rateLimiter = RateLimiter(rate = rateLimit, burst = burst)
+        self.session = self.__createSession(strictSsl = strictSsl, poolSize = poolSize, poolHosts = poolHosts, keepAlive = keepAlive)
+
+    def archiveUrl(self, sid, fileType):
+        return self.baseUrl + '/archive/' + sid + '/' + fileType
+
+    def calculate(self, requestType, jsonData = None, params = None, cancelEvent = None):
+        # The response is returned whatever its HTTP status code, once any transient failures have been retried
+        if requestType not in CloudRFRequest.REQUEST_TYPES:
+            raise CloudRFValidationError('Unsupported request type of "%s" being used. Allowed request types are: %s' % (requestType, CloudRFRequest.REQUEST_TYPES))
+
+        with self.__trace('calculate', request_type = requestType, url = self.calculationUrl(requestType)) as span:
+            encodeStartTime = time.perf_counter()
+            headers = {
+                'key': self.apiKey
+            }
+            requestArguments = {}
+
+            if jsonData is not None:
+                # Encoded here rather than by requests so that the faster JSON backend is used for large requests
+                requestArguments['data'] = JsonSerializer.dumps(jsonData)
+                headers['Content-Type'] = 'application/json'
+
+                # Compressed once here so that a retry sends the same bytes without compressing them again
+                if self.compression and len(requestArguments['data']) >= self.compressionThreshold:
+                    requestArguments['data'] = self.__compress(requestArguments['data'])
+                    headers['Content-Encoding'] = self.compression
+            if params is not None:
+                requestArguments['params'] = params
+
+            if span is not None:
+                span.addPhase('encode', time.perf_counter() - encodeStartTime)
+                span.attributes['request_bytes'] = len(requestArguments.get('data', b''))
+                span.attributes['content_encoding'] = headers.get('Content-Encoding')
+
+            response = self.__sendRequest(
+                method = 'POST',
+                url = self.calculationUrl(requestType),
+                rateLimited = True,
+                cancelEvent = cancelEvent,
+                span = span,
+                headers = headers,
+                **requestArguments
+            )
+
+            if span is not None:
+                span.attributes['status_code'] = response.status_code
+                span.attributes['response_bytes'] = len(response.content)
+
+            return response
+
+    def calculationUrl(self, requestType):
+        return self.baseUrl + '/' + requestType
+
+    def checkResponse(self, statusCode, responseText):
+        if statusCode == 200:
+            return
+
+        # Authentication problems will affect every request, so are raised as their own type
+        if statusCode == 401:
+            raise CloudRFAuthenticationError('HTTP 401 refers to an unauthorised request. Your API key is likely incorrect.', statusCode = statusCode, responseText = responseText)
+        elif statusCode == 403:
+            raise CloudRFAuthenticationError('HTTP 403 refers to a forbidden request. Your API key appears to be correct but you do not appear to have permission to make your request.', statusCode = statusCode, responseText = responseText)
+        elif statusCode == 400:
+            message = 'HTTP 400 refers to a bad request. You likely have bad values in your input JSON/CSV.'
+        elif statusCode == 429:
+            message = 'HTTP 429 refers to too many requests. The CloudRF API service was still rate limiting after %d retries, please consider lowering your rate limit.' % self.maxRetries
+        elif statusCode >= 500:
+            message = 'HTTP %d refers to an issue with the server. A problem with the CloudRF API service appears to have occurred which did not clear after %d retries.' % (statusCode, self.maxRetries)
+        else:
+            message = 'An unknown HTTP %d error has occured. Please consult the response from the CloudRF API.' % statusCode
+
+        raise CloudRFHttpError(message, statusCode = statusCode, responseText = responseText)
+
+    def close(self):
+        self.session.close()
+
+    def downloadOutputFile(self, requestType, responseJson, fileType, saveBasePath, cancelEvent = None):
+        # Returns a list of the paths which were saved, as some file types are made up of more than one file
+        if fileType not in CloudRFRequest.OUTPUT_FILE_TYPES.get(requestType, []):
+            raise CloudRFValidationError('Unable to retrieve %s output file of %s request. Allowed output file types are: %s' % (fileType, requestType, CloudRFRequest.OUTPUT_FILE_TYPES.get(requestType, [])))
+
+        self.__verboseLog('Retrieving output file: %s' % fileType)
+
+        # The server may give a file a different extension, so keep track of where each file was actually saved
+        savedPaths = []
+
+        if requestType == 'area':
+            if fileType == 'png':
+                # PNG links exist already in the response JSON so we can just grab them from there
+                pngPath4326 = saveBasePath + '.4326.png'
+                savedPaths.append(self.downloadFile(responseJson['PNG_WGS84'], pngPath4326, cancelEvent = cancelEvent))
+                self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
+            elif fileType == 'url':
+                txtPath = saveBasePath + '.url'
+                with open(txtPath, 'a') as txtOutputFile:
+                    txtOutputFile.write(self.baseUrl + '/archive/calc?id=' + responseJson['sid'])
+                savedPaths.append(txtPath)
+                self.__verboseLog('URL saved to %s' % txtPath)
+            else:
+                # Anything else we just pull out of the archive
+                savePath = saveBasePath + '.' + fileType
+                savedPaths.append(self.downloadFile(self.archiveUrl(responseJson['sid'], fileType), savePath, cancelEvent = cancelEvent))
+                self.__verboseLog('%s file saved to %s' % (fileType, savePath))
+
+        elif requestType in ['interference', 'mesh'] and fileType == 'png':
+            # PNG links exist already in the response JSON so we can just grab them from there
+            mercatorKey, wgs84Key = ('PNG_Mercator', 'PNG_WGS84') if requestType == 'interference' else ('png_mercator', 'png_wgs84')
+
+            pngPath3857 = saveBasePath + '.3857.png'
+            savedPaths.append(self.downloadFile(responseJson[mercatorKey], pngPath3857, cancelEvent = cancelEvent))
+            self.__verboseLog('3857 projected PNG saved to %s' % pngPath3857)
+            pngPath4326 = saveBasePath + '.4326.png'
+            savedPaths.append(self.downloadFile(responseJson[wgs84Key], pngPath4326, cancelEvent = cancelEvent))
+            self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
+
+        elif requestType == 'multisite':
+            # PNG links exist already in the response JSON so we can just grab them from there
+            pngPath4326 = saveBasePath + '.4326.png'
+            savedPaths.append(self.downloadFile(responseJson['PNG_WGS84'], pngPath4326, cancelEvent = cancelEvent))
+            self.__verboseLog('4326 projected PNG saved to %s' % pngPath4326)
+
+        elif requestType == 'network':
+            # Network returns an array of responses
+            txtPath = saveBasePath + '.txt'
+            with open(txtPath, 'a') as txtOutputFile:
+                for count, row in enumerate(responseJson, start = 1):
+                    txtOutputFile.write('Site %d (%s, %s): %s dBm\n' % (
+                        count,
+                        row['Transmitters'][0]['Latitude'],
+                        row['Transmitters'][0]['Longitude'],
+                        row['Transmitters'][0]['Signal power at receiver dBm'],
+                    ))
+            savedPaths.append(txtPath)
+            self.__verboseLog('TXT saved to %s' % txtPath)
+
+        elif requestType == 'path' and fileType == 'png':
+            pngPath = saveBasePath + '.png'
+            savedPaths.append(self.downloadFile(responseJson['Chart image'], pngPath, cancelEvent = cancelEvent))
+            self.__verboseLog('Path profile PNG saved to %s' % pngPath)
+
+        else:
+            # Every other output file is a KMZ which is linked to from the response JSON
+            kmzPath = saveBasePath + '.kmz'
+            savedPaths.append(self.downloadFile(responseJson['kmz'], kmzPath, cancelEvent = cancelEvent))
+            self.__verboseLog('%s KMZ saved to %s' % (requestType.capitalize(), kmzPath))
+
+        return savedPaths
+
+    def downloadOutputFiles(self, result, saveBasePath, fileTypes = None, cancelEvent = None):
+        # Every output file type of the request is downloaded when no file types are given
+        if fileTypes is None:
+            fileTypes = CloudRFRequest.OUTPUT_FILE_TYPES[result.requestType]
+
+        for fileType in fileTypes:
+            result.files[fileType] = self.downloadOutputFile(result.requestType, result.response, fileType, saveBasePath, cancelEvent = cancelEvent)
+
+        return result
+
+    def downloadFile(self, url, savePath, cancelEvent = None):
+        # Returns the path the file was saved to, which may have a different extension to the one asked for
+        startTime = time.perf_counter()
+
+        with self.__trace('download', url = url) as span:
+            # Output files are asked for with the Accept-Encoding header of the session, which covers every encoding that can be decoded here.
+            # Any content encoding used by the server is decoded as the file is written, so the file on disk is always the file itself.
+            with self.__sendRequest(method = 'GET', url = url, rateLimited = False, cancelEvent = cancelEvent, span = span, stream = True) as response:
+                if span is not None:
+                    span.attributes['status_code'] = response.status_code
+
+                if response.status_code != 200:
+                    raise CloudRFHttpError('HTTP %d when retrieving %s' % (response.status_code, url), statusCode = response.status_code, responseText = response.text)
+
+                # If we are retrieving a stream
+                if response.headers.get('Content-Disposition'):
+                    # The file extension may be different on the server side, so we should use that by default
+                    serverFilename = re.findall("filename=(.+)", response.headers.get('Content-Disposition'))[0]
+                    serverFilename = serverFilename.replace('"', '')
+                    serverFileExtension = serverFilename.split('.', 1)[1]
+
+                    savePathBaseFilename = savePath.split('.', 1)[0]
+                    savePath = savePathBaseFilename + '.' + serverFileExtension
+
+                # Write in chunks to a temporary file alongside the final path so that memory use stays bounded and a partial download never takes the place of the output file
+                temporaryPath = '%s.%s.part' % (savePath, uuid.uuid4().hex[:8])
+                bytesWritten = 0
+
+                # Time spent writing is kept apart from time spent reading, so that a slow disk is not mistaken for a slow network
+                loopStartTime = time.perf_counter()
+                writeSeconds = 0.0
+
+                try:
+                    with open(temporaryPath, 'wb') as outputFile:
+                        for chunk in response.iter_content(chunk_size = self.downloadChunkSize):
+                            if cancelEvent is not None and cancelEvent.is_set():
+                                raise CloudRFCancelledError('Download of %s was cancelled.' % url)
+
+                            chunkStartTime = time.perf_counter()
+                            outputFile.write(chunk)
+                            writeSeconds += time.perf_counter() - chunkStartTime
+                            bytesWritten += len(chunk)
+
+                        readSeconds = time.perf_counter() - loopStartTime - writeSeconds
+                        closeStartTime = time.perf_counter()
+
+                    os.replace(temporaryPath, savePath)
+                    writeSeconds += time.perf_counter() - closeStartTime
+                except BaseException:
+                    if os.path.exists(temporaryPath):
+                        os.remove(temporaryPath)
+                    raise
+
+                contentEncoding = response.headers.get('Content-Encoding')
+                bytesTransferred = response.raw.tell()
+
+            if span is not None:
+                span.addPhase('download', readSeconds)
+                span.addPhase('disk', writeSeconds)
+                span.attributes['response_bytes'] = bytesTransferred
+                span.attributes['file_bytes'] = bytesWritten
+                span.attributes['content_encoding'] = contentEncoding
+                span.attributes['path'] = savePath
+
+        elapsedSeconds = time.perf_counter() - startTime
+        self.__verboseLog('Downloaded %d bytes to %s in %.2f seconds (%.0f bytes/s).' % (bytesWritten, savePath, elapsedSeconds, bytesWritten / elapsedSeconds if elapsedSeconds > 0 else 0))
+
+        if contentEncoding:
+            self.__verboseLog('%d bytes were transferred with %s content encoding.' % (bytesTransferred, contentEncoding))
+
+        return savePath
+
+    def run(self, request, cancelEvent = None):
+        # Run a CloudRFRequest and return its CloudRFResult, a response which is not a HTTP 200 raises a CloudRFHttpError
+        startTime = time.perf_counter()
+
+        with self.calculate(requestType = request.requestType, jsonData = request.jsonData, params = request.params, cancelEvent = cancelEvent) as response:
+            if response.status_code != 200:
+                self.checkResponse(statusCode = response.status_code, responseText = response.text)
+
+            responseContent = response.content
+
+        # The response bytes are parsed directly, without being decoded to text first
+        try:
+            responseJson = JsonSerializer.loads(responseContent)
+        except ValueError:
+            raise CloudRFHttpError('The CloudRF API service responded with a HTTP 200 which is not valid JSON.', statusCode = 200, responseText = responseContent.decode('utf-8', errors = 'replace'))
+
+        return CloudRFResult(request = request, response = responseJson, responseContent = responseContent, elapsedSeconds = time.perf_counter() - startTime)
+
+    def __compress(self, content):
+        if self.compression == 'gzip':
+            import gzip
+
+            # A fixed modification time means that identical requests are compressed to identical bytes
+            compressedContent = gzip.compress(content, compresslevel = 6, mtime = 0)
+        else:
+            # Compressors are not shared as they can not be used by more than one thread at once
+            compressedContent = self.__zstandard.ZstdCompressor(level = 3).compress(content)
+
+        self.__verboseLog('Compressed request body from %d to %d bytes with %s.' % (len(content), len(compressedContent), self.compression))
+
+        return compressedContent
+
+    def __createSession(self, strictSsl, poolSize, poolHosts, keepAlive):
+        # Blocking the pool means that no more than the pool size of connections are ever opened to a single host
+        adapter = requests.adapters.HTTPAdapter(pool_connections = poolHosts, pool_maxsize = poolSize, pool_block = True)
+
+        if self.tracer is not None:
+            RequestTracer.instrument(adapter)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.verify = strictSsl
+
+        if not keepAlive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def __retryDelay(self, attempt):
+        # Exponential backoff with full jitter, so that workers which failed together don't all retry together
+        return random.uniform(0, min(self.retryMaxBackoff, self.retryBackoff * (2 ** (attempt - 1))))
+
+    def __sendRequest(self, method, url, rateLimited, cancelEvent = None, span = None, **requestArguments):
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if span is not None:
+                span.attributes['attempts'] = attempt
+
+            if rateLimited:
+                waitedSeconds = self.rateLimiter.acquire()
+                if waitedSeconds > 0:
+                    self.__verboseLog('Waited %.2f seconds for the rate limit.' % waitedSeconds)
+
+                if span is not None:
+                    span.addPhase('rate_wait', waitedSeconds)
+
+            # A request which has been given up on by its caller is not sent, nor retried
+            if cancelEvent is not None and cancelEvent.is_set():
+                raise CloudRFCancelledError('Request to %s was cancelled.' % url)
+
+            if span is not None:
+                RequestTracer.setActiveSpan(span)
+                attemptStartTime = time.perf_counter()
+                networkSeconds = span.phaseSeconds('pool_wait', 'connect', 'tls', 'upload', 'server')
+
+            try:
+                response = self.session.request(method, url, timeout = self.timeout, **requestArguments)
+
+                # Whatever is left once the connection has answered is reading the body, which a streamed download does itself
+                if span is not None and not requestArguments.get('stream'):
+                    span.addPhase('download', time.perf_counter() - attemptStartTime - (span.phaseSeconds('pool_wait', 'connect', 'tls', 'upload', 'server') - networkSeconds))
+            except requests.exceptions.SSLError as e:
+                # Retrying will not fix a certificate problem
+                raise CloudRFSslError('SSL error occurred when connecting to %s: %s' % (url, e))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt > self.maxRetries:
+                    raise CloudRFConnectionError('Unable to connect to %s after %d attempts: %s' % (url, attempt, e))
+
+                retryDelay = self.__retryDelay(attempt)
+                self.__log('Connection to %s failed, retrying in %.2f seconds (retry %d of %d).' % (url, retryDelay, attempt, self.maxRetries))
+
+                if span is not None:
+                    span.addPhase('retry_wait', retryDelay)
+
+                time.sleep(retryDelay)
+                continue
+            finally:
+                if span is not None:
+                    RequestTracer.setActiveSpan(None)
+
+            # Anything other than a transient failure, such as a bad request, is returned straight away as retrying will not help
+            if response.status_code not in self.RETRYABLE_HTTP_STATUS_CODES or attempt > self.maxRetries:
+                return response
+
+            retryDelay = self.__retryDelay(attempt)
+            if response.status_code == 429:
+                retryDelay = RateLimiter.retryAfterSeconds(response.headers.get('Retry-After'), default = retryDelay)
+
+            self.__log('HTTP %d received from %s, retrying in %.2f seconds (retry %d of %d).' % (response.status_code, url, retryDelay, attempt, self.maxRetries))
+            response.close()
+
+            if response.status_code == 429 and rateLimited:
+                # The server has asked us to slow down, every worker waits before sending anything else
+                self.rateLimiter.pause(retryDelay)
+            else:
+                if span is not None:
+                    span.addPhase('retry_wait', retryDelay)
+
+                time.sleep(retryDelay)
+
+    @contextlib.contextmanager
+    def __trace(self, name, **attributes):
+        # Yields the span of a request, or None when requests are not being traced
+        if self.tracer is None:
+            yield None
+            return
+
+        span = self.tracer.start(name, **attributes)
+
+        try:
+            yield span
+        except BaseException as e:
+            span.error = '%s: %s' % (e.__class__.__name__, e)
+            raise
+        finally:
+            self.tracer.finish(span)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+# The base of every error raised by the CloudRF client, a request which fails with one of these does not stop the rest of a batch from running
+class CloudRFError(Exception):
+    pass
+
+# A request could not be made as it was given bad values, such as an unsupported request type
+class CloudRFValidationError(CloudRFError, ValueError):
+    pass
+
+# The CloudRF API service responded, but not with a HTTP 200
+class CloudRFHttpError(CloudRFError):
+    def __init__(self, message, statusCode, responseText):
+        super().__init__(message)
+        self.statusCode = statusCode
+        self.responseText = responseText
+
+# The CloudRF API service responded with a HTTP 401 or 403, every other request with the same API key will fail in the same way
+class CloudRFAuthenticationError(CloudRFHttpError):
+    pass
+
+# The CloudRF API service could not be reached, even after retrying
+class CloudRFConnectionError(CloudRFError):
+    pass
+
+# The SSL certificate of the CloudRF API service could not be verified, this is not retried
+class CloudRFSslError(CloudRFConnectionError):
+    pass
+
+# The request was given up on by its caller, such as when an asyncio task is cancelled or times out
+class CloudRFCancelledError(CloudRFError):
+    pass
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+from core.CloudRFError import CloudRFValidationError
+
+# A single request to the CloudRF API service, ready to be run by CloudRFClient or AsyncCloudRFClient
+#
+# Requests are best made with the builder for their request type, such as CloudRFRequest.area(templateJson), which also checks the
+# request for common mistakes. Any changes made by a builder are listed in warnings. Builders never change the JSON which they are given.
+class CloudRFRequest:
+    OUTPUT_FILE_TYPES = {
+        'area': ['kmz', 'png', 'shp', 'tiff', 'url'],
+        'interference': ['png'],
+        'mesh': ['kmz', 'png'],
+        'multisite': ['png'],
+        'network': ['txt'],
+        'path': ['kmz', 'png'],
+        'points': ['kmz']
+    }
+    REQUEST_TYPES = ['area', 'interference', 'mesh', 'multisite', 'network', 'path', 'points']
+
+    def __init__(self, requestType, jsonData = None, params = None):
+        if requestType not in self.REQUEST_TYPES:
+            raise CloudRFValidationError('Unsupported request type of "%s" being used. Allowed request types are: %s' % (requestType, self.REQUEST_TYPES))
+
+        self.requestType = requestType
+        self.jsonData = jsonData
+        self.params = params
+        self.warnings = []
+
+    def area(templateJson):
+        jsonData = templateJson
+        warnings = []
+
+        # A receiver location will prevent an area calculation, the receiver is copied before it is changed as the template may be shared
+        receiver = templateJson.get('receiver') if isinstance(templateJson, dict) else None
+
+        if isinstance(receiver, dict) and (receiver.get('lat', 0) != 0 or receiver.get('lon', 0) != 0):
+            jsonData = dict(templateJson)
+            jsonData['receiver'] = dict(receiver)
+
+            for key in ['lat', 'lon']:
+                if jsonData['receiver'].get(key, 0) != 0:
+                    warnings.append('Your template has a value in the receiver.%s key which will prevent an area calculation. Setting a safe default.' % key)
+                    jsonData['receiver'][key] = 0
+
+        request = CloudRFRequest('area', jsonData = jsonData)
+        request.warnings = warnings
+
+        return request
+
+    def interference(networkName, jammerNetworkName, name = None):
+        return CloudRFRequest('interference', jsonData = {
+            'name': name if name else networkName,
+            's_network': networkName,
+            'j_network': jammerNetworkName,
+            'colour_key': 'JS.dB'
+        })
+
+    def mesh(networkName):
+        return CloudRFRequest('mesh', params = {
+            'network': networkName
+        })
+
+    def multisite(templateJson, transmitters):
+        # Each transmitter is a dictionary in the same format as the "transmitters" list of the multisite API
+        jsonData = dict(templateJson)
+        jsonData['transmitters'] = list(transmitters)
+
+        if not jsonData['transmitters']:
+            raise CloudRFValidationError('A multisite request needs at least one transmitter.')
+
+        return CloudRFRequest('multisite', jsonData = jsonData)
+
+    def network(networkName, latitude, longitude, altitude):
+        return CloudRFRequest('network', params = {
+            'net': networkName,
+            'lat': latitude,
+            'lon': longitude,
+            'rxh': altitude
+        })
+
+    def path(templateJson):
+        return CloudRFRequest('path', jsonData = templateJson)
+
+    def points(templateJson, points, transmitter = None):
+        # Each point is a dictionary with "lat", "lon" and "alt" keys, the transmitter location defaults to the very first point
+        jsonData = dict(templateJson)
+        jsonData['points'] = list(points)
+
+        if not jsonData['points']:
+            raise CloudRFValidationError('A points request needs at least one point.')
+
+        if transmitter is None:
+            transmitter = jsonData['points'][0]
+
+        jsonData['transmitter'] = dict(templateJson.get('transmitter', {}))
+        jsonData['transmitter']['lat'] = transmitter['lat']
+        jsonData['transmitter']['lon'] = transmitter['lon']
+
+        return CloudRFRequest('points', jsonData = jsonData)
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+
+# The outcome of a request which has been run by CloudRFClient or AsyncCloudRFClient
+#
+# The response is the parsed JSON from the CloudRF API service, and responseContent the raw bytes which it was parsed from. Output files are only added to files once they have been
+# downloaded with downloadOutputFiles(), keyed by file type with a list of the paths they were saved to.
+class CloudRFResult:
+    def __init__(self, request, response, responseContent, elapsedSeconds):
+        self.request = request
+        self.requestType = request.requestType
+        self.response = response
+        self.responseContent = responseContent
+        self.elapsedSeconds = elapsedSeconds
+        self.sid = response.get('sid') if isinstance(response, dict) else None
+        self.files = {}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import json
+
+# Encodes and decodes the JSON sent to and received from the CloudRF API service
+#
+# orjson is used when it is installed as it is much faster for large requests and responses, such as a points request with thousands
+# of Transmitters, otherwise the json module from the standard library is used. Both work on bytes directly, so a response never needs
+# to be decoded to text before it is parsed. The backend is only chosen on first use so that importing this module stays cheap.
+#
+# Anything which needs the same output every time, such as the keys of the response cache or batch journal, should keep using the json
+# module as the two backends do not format every value in exactly the same way.
+class JsonSerializer:
+    BACKEND_AUTO = 'auto'
+    BACKEND_JSON = 'json'
+    BACKEND_ORJSON = 'orjson'
+    BACKENDS = [BACKEND_AUTO, BACKEND_JSON, BACKEND_ORJSON]
+
+    __backend = None
+    __orjson = None
+
+    def backend():
+        if JsonSerializer.__backend is None:
+            JsonSerializer.setBackend(JsonSerializer.BACKEND_AUTO)
+
+        return JsonSerializer.__backend
+
+    def dumps(data):
+        # Returns compact UTF-8 encoded bytes, ready to be sent as a request body or written to a file
+        if JsonSerializer.backend() == JsonSerializer.BACKEND_ORJSON:
+            return JsonSerializer.__orjson.dumps(data)
+
+        return json.dumps(data, separators = (',', ':'), ensure_ascii = False).encode('utf-8')
+
+    def loads(data):
+        # Accepts bytes or text, a document which is not valid JSON raises json.decoder.JSONDecodeError with either backend
+        if JsonSerializer.backend() == JsonSerializer.BACKEND_ORJSON:
+            return JsonSerializer.__orjson.loads(data)
+
+        return json.loads(data)
+
+    def setBackend(backend):
+        if backend not in JsonSerializer.BACKENDS:
+            raise ValueError('Unsupported JSON backend of "%s". Allowed JSON backends are: %s' % (backend, JsonSerializer.BACKENDS))
+
+        if backend in [JsonSerializer.BACKEND_AUTO, JsonSerializer.BACKEND_ORJSON]:
+            try:
+                import orjson
+                JsonSerializer.__orjson = orjson
+                JsonSerializer.__backend = JsonSerializer.BACKEND_ORJSON
+                return
+            except ImportError:
+                if backend == JsonSerializer.BACKEND_ORJSON:
+                    raise ValueError('The orjson JSON backend was asked for, but orjson is not installed. Please install it with "pip install orjson".')
+
+        JsonSerializer.__backend = JsonSerializer.BACKEND_JSON
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+# A token bucket which is shared by every worker so that requests to the CloudRF API never exceed a set rate, no matter how many run at once
+class RateLimiter:
+    def __init__(self, rate, burst = 1):
+        # A rate of 0 means unlimited, although the limiter will still honour any pause asked for by the server
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+
+        self.__lock = threading.Lock()
+        self.__pausedUntil = 0.0
+        self.__tokens = float(self.burst)
+        self.__updatedAt = time.monotonic()
+
+    def acquire(self):
+        # Block until a request is allowed to be sent, returns the number of seconds spent waiting
+        waitedSeconds = 0.0
+
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+
+                if now >= self.__pausedUntil:
+                    if self.rate <= 0:
+                        return waitedSeconds
+
+                    self.__refill(now)
+
+                    if self.__tokens >= 1:
+                        self.__tokens -= 1
+                        return waitedSeconds
+
+                    sleepSeconds = (1 - self.__tokens) / self.rate
+                else:
+                    sleepSeconds = self.__pausedUntil - now
+
+            time.sleep(sleepSeconds)
+            waitedSeconds += sleepSeconds
+
+    def pause(self, seconds):
+        # Stop every worker from sending requests for a number of seconds, such as when the server responds with a HTTP 429
+        with self.__lock:
+            self.__pausedUntil = max(self.__pausedUntil, time.monotonic() + seconds)
+
+            # Don't let a burst build up while paused, only a single request is let through once the pause is over
+            self.__tokens = 1.0
+            self.__updatedAt = self.__pausedUntil
+
+    def retryAfterSeconds(headerValue, default):
+        # The Retry-After header can either be a number of seconds or a HTTP date
+        if not headerValue:
+            return default
+
+        try:
+            return max(0.0, float(headerValue))
+        except ValueError:
+            pass
+
+        # Only imported when needed as it is slow to import, and most servers send a number of seconds
+        import email.utils
+
+        try:
+            retryAt = email.utils.parsedate_to_datetime(headerValue)
+            return max(0.0, retryAt.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+
+    def __refill(self, now):
+        if now > self.__updatedAt:
+            self.__tokens = min(float(self.burst), self.__tokens + (now - self.__updatedAt) * self.rate)
+            self.__updatedAt = now
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+import urllib3
+
+# Records where the time of each calculation and output file download goes, and saves it to a trace file
+#
+# Each request is a span which is split into phases, in seconds:
+#   rate_wait   waiting for the rate limiter, including any pause asked for by a HTTP 429
+#   retry_wait  waiting before retrying a failed attempt
+#   pool_wait   waiting for a free connection from the connection pool
+#   encode      encoding and compressing the request body
+#   connect     resolving the host name and opening the TCP connection, 0 when a kept alive connection is reused
+#   tls         the TLS handshake
+#   upload      sending the request headers and body
+#   server      waiting for the response headers once the request has been sent, which is mostly the calculation itself
+#   download    reading the response body
+#   disk        writing an output file to disk
+#
+# The network phases are measured by the connections of a session which has been instrumented with instrument(), for whichever
+# span is active on the thread using the connection. Spans are saved one per line, either as plain JSON or as an OTLP/JSON
+# ExportTraceServiceRequest which can be loaded by OpenTelemetry tools. Every span saved by a tracer shares the same trace ID.
+class RequestSpan:
+    def __init__(self, name, traceId, attributes):
+        self.name = name
+        self.traceId = traceId
+        self.spanId = os.urandom(8).hex()
+        self.attributes = attributes
+        self.phases = {}
+        self.error = None
+        self.startTime = time.time()
+        self.endTime = None
+        self.__startCounter = time.perf_counter()
+
+    def addPhase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def durationSeconds(self):
+        return self.endTime - self.startTime
+
+    def end(self):
+        self.endTime = self.startTime + (time.perf_counter() - self.__startCounter)
+
+    def phaseSeconds(self, *phases):
+        return sum(self.phases.get(phase, 0.0) for phase in phases)
+
+class RequestTracer:
+    FORMATS = ['jsonl', 'otlp']
+    PHASES = ['rate_wait', 'retry_wait', 'pool_wait', 'encode', 'connect', 'tls', 'upload', 'server', 'download', 'disk']
+
+    # The span of the request being made by each thread, used by the instrumented connections
+    __active = threading.local()
+
+    def __init__(self, path, format = 'jsonl', serviceName = 'cloudrf-api-client'):
+        if format not in self.FORMATS:
+            raise ValueError('Unsupported trace format of "%s". Allowed trace formats are: %s' % (format, self.FORMATS))
+
+        self.path = path
+        self.format = format
+        self.serviceName = serviceName
+        self.traceId = os.urandom(16).hex()
+
+        # Totals of each span name, in the form of {name: {'count': ..., 'seconds': ..., 'phases': {...}}}
+        self.totals = {}
+
+        self.__lock = threading.Lock()
+        self.__file = open(path, 'a')
+
+    def activeSpan():
+        return getattr(RequestTracer.__active, 'span', None)
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+    def finish(self, span):
+        span.end()
+
+        if self.format == 'otlp':
+            line = json.dumps(self.__otlpRecord(span), separators = (',', ':'))
+        else:
+            line = json.dumps(self.__jsonRecord(span), separators = (',', ':'))
+
+        with self.__lock:
+            total = self.totals.setdefault(span.name, {'count': 0, 'seconds': 0.0, 'phases': {}})
+            total['count'] += 1
+            total['seconds'] += span.durationSeconds()
+
+            for phase, seconds in span.phases.items():
+                total['phases'][phase] = total['phases'].get(phase, 0.0) + seconds
+
+            self.__file.write(line + '\n')
+            self.__file.flush()
+
+    def instrument(adapter):
+        # Connections made by the adapter of a requests session record their network phases against the active span
+        adapter.poolmanager.pool_classes_by_scheme = {
+            'http': TracedHTTPConnectionPool,
+            'https': TracedHTTPSConnectionPool,
+        }
+
+    def setActiveSpan(span):
+        RequestTracer.__active.span = span
+
+    def start(self, name, **attributes):
+        return RequestSpan(name, self.traceId, attributes)
+
+    def summary(self):
+        # One line for each span name, with the phases that took any time in the order they happen
+        lines = []
+
+        with self.__lock:
+            for name, total in self.totals.items():
+                phases = ', '.join('%s %.2f s' % (phase, total['phases'][phase]) for phase in self.PHASES if total['phases'].get(phase, 0) >= 0.005)
+                lines.append('%d %s requests took %.2f s in total: %s' % (total['count'], name, total['seconds'], phases or 'no measurable phases'))
+
+        return lines
+
+    def __jsonRecord(self, span):
+        return {
+            'name': span.name,
+            'trace_id': span.traceId,
+            'span_id': span.spanId,
+            'start': round(span.startTime, 6),
+            'duration': round(span.durationSeconds(), 6),
+            'phases': {phase: round(span.phases[phase], 6) for phase in self.PHASES if phase in span.phases},
+            'attributes': span.attributes,
+            'error': span.error,
+        }
+
+    def __otlpAttribute(self, key, value):
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        elif isinstance(value, int):
+            # 64 bit integers are strings in OTLP/JSON
+            return {'key': key, 'value': {'intValue': str(value)}}
+        elif isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    def __otlpRecord(self, span):
+        attributes = [self.__otlpAttribute('cloudrf.' + key, value) for key, value in span.attributes.items() if value is not None]
+        attributes += [self.__otlpAttribute('cloudrf.phase.' + phase, span.phases[phase]) for phase in self.PHASES if phase in span.phases]
+
+        otlpSpan = {
+            'traceId': span.traceId,
+            'spanId': span.spanId,
+            'name': span.name,
+            # SPAN_KIND_CLIENT
+            'kind': 3,
+            'startTimeUnixNano': str(int(span.startTime * 1e9)),
+            'endTimeUnixNano': str(int(span.endTime * 1e9)),
+            'attributes': attributes,
+            # STATUS_CODE_OK or STATUS_CODE_ERROR
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+        }
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [self.__otlpAttribute('service.name', self.serviceName)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'CloudRFClient'},
+                    'spans': [otlpSpan],
+                }],
+            }],
+        }
+
+# The connection pools and connections used by an instrumented adapter
+#
+# When no span is active on the thread they behave exactly as the urllib3 classes which they extend.
+class TracedHTTPConnection(urllib3.connection.HTTPConnection):
+    def _new_conn(self):
+        span = RequestTracer.activeSpan()
+        startTime = time.perf_counter()
+
+        try:
+            return super()._new_conn()
+        finally:
+            if span is not None:
+                span.addPhase('connect', time.perf_counter() - startTime)
+
+    def getresponse(self, *arguments, **keywordArguments):
+        span = RequestTracer.activeSpan()
+        startTime = time.perf_counter()
+
+        try:
+            return super().getresponse(*arguments, **keywordArguments)
+        finally:
+            if span is not None:
+                span.addPhase('server', time.perf_counter() - startTime)
+
+    def request(self, *arguments, **keywordArguments):
+        span = RequestTracer.activeSpan()
+
+        if span is None:
+            return super().request(*arguments, **keywordArguments)
+
+        # A plain HTTP connection is opened while the request is being sent, which is not part of the upload
+        startTime = time.perf_counter()
+        connectionSeconds = span.phaseSeconds('connect', 'tls')
+
+        try:
+            return super().request(*arguments, **keywordArguments)
+        finally:
+            span.addPhase('upload', time.perf_counter() - startTime - (span.phaseSeconds('connect', 'tls') - connectionSeconds))
+
+class TracedHTTPSConnection(TracedHTTPConnection, urllib3.connection.HTTPSConnection):
+    def connect(self):
+        span = RequestTracer.activeSpan()
+
+        if span is None:
+            return super().connect()
+
+        # Anything other than opening the socket is the TLS handshake
+        startTime = time.perf_counter()
+        connectSeconds = span.phaseSeconds('connect')
+
+        try:
+            return super().connect()
+        finally:
+            span.addPhase('tls', time.perf_counter() - startTime - (span.phaseSeconds('connect') - connectSeconds))
+
+class TracedHTTPConnectionPool(urllib3.connectionpool.HTTPConnectionPool):
+    ConnectionCls = TracedHTTPConnection
+
+    def _get_conn(self, timeout = None):
+        span = RequestTracer.activeSpan()
+        startTime = time.perf_counter()
+
+        try:
+            return super()._get_conn(timeout)
+        finally:
+            if span is not None:
+                span.addPhase('pool_wait', time.perf_counter() - startTime)
+
+class TracedHTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+    ConnectionCls = TracedHTTPSConnection
+
+    def _get_conn(self, timeout = None):
+        span = RequestTracer.activeSpan()
+        startTime = time.perf_counter()
+
+        try:
+            return super()._get_conn(timeout)
+        finally:
+            if span is not None:
+                span.addPhase('pool_wait', time.perf_counter() - startTime)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import shutil
+import time
+import uuid
+
+from core.CanonicalHash import CanonicalHash
+
+# A local cache of CloudRF API responses and their output files, keyed by the content of the request
+#
+# Each entry is a directory named after the hash of the request, holding:
+#   meta.json     - when the entry was created and which endpoint it was for
+#   response.json - the raw response from the CloudRF API, its modified time is updated on each use
+#   artifacts/    - one directory per output file type, holding the files which were saved for that type
+class ResponseCache:
+    ARTIFACT_PREFIX = 'artifact'
+
+    def __init__(self, directory, maxSizeBytes, ttlSeconds):
+        self.directory = directory
+        self.maxSizeBytes = maxSizeBytes
+        self.ttlSeconds = ttlSeconds
+
+        os.makedirs(self.directory, exist_ok = True)
+
+    def getResponse(self, cacheKey):
+        entryPath = self.__entryPath(cacheKey)
+        responsePath = os.path.join(entryPath, 'response.json')
+
+        try:
+            with open(os.path.join(entryPath, 'meta.json'), 'r') as metaFile:
+                meta = json.load(metaFile)
+
+            if self.__isExpired(meta):
+                shutil.rmtree(entryPath, ignore_errors = True)
+                return None
+
+            with open(responsePath, 'rb') as responseFile:
+                responseContent = responseFile.read()
+
+            # Used as the last access time when deciding which entries to evict
+            os.utime(responsePath)
+
+            return responseContent
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+
+    def key(url, jsonData):
+        return CanonicalHash.sha256({'url': url, 'request': jsonData})
+
+    def prune(self):
+        entries = []
+        totalSizeBytes = 0
+
+        for entryPath in self.__entryPaths():
+            try:
+                with open(os.path.join(entryPath, 'meta.json'), 'r') as metaFile:
+                    meta = json.load(metaFile)
+
+                lastAccessed = os.path.getmtime(os.path.join(entryPath, 'response.json'))
+            except (FileNotFoundError, json.decoder.JSONDecodeError):
+                # Left behind by a process which was stopped part way through storing a response
+                shutil.rmtree(entryPath, ignore_errors = True)
+                continue
+
+            if self.__isExpired(meta):
+                shutil.rmtree(entryPath, ignore_errors = True)
+                continue
+
+            sizeBytes = self.__directorySize(entryPath)
+            entries.append((lastAccessed, sizeBytes, entryPath))
+            totalSizeBytes += sizeBytes
+
+        # Least recently used entries are evicted first until the cache fits within its maximum size
+        for lastAccessed, sizeBytes, entryPath in sorted(entries):
+            if totalSizeBytes <= self.maxSizeBytes:
+                break
+
+            shutil.rmtree(entryPath, ignore_errors = True)
+            totalSizeBytes -= sizeBytes
+
+    def restoreArtifact(self, cacheKey, fileType, saveBasePath):
+        artifactPath = os.path.join(self.__entryPath(cacheKey), 'artifacts', fileType)
+
+        if not os.path.isdir(artifactPath):
+            return None
+
+        savedPaths = []
+
+        for filename in sorted(os.listdir(artifactPath)):
+            savePath = saveBasePath + filename[len(self.ARTIFACT_PREFIX):]
+            temporaryPath = '%s.%s.part' % (savePath, uuid.uuid4().hex[:8])
+
+            shutil.copyfile(os.path.join(artifactPath, filename), temporaryPath)
+            os.replace(temporaryPath, savePath)
+            savedPaths.append(savePath)
+
+        return savedPaths
+
+    def storeArtifact(self, cacheKey, fileType, saveBasePath, savedPaths):
+        artifactsPath = os.path.join(self.__entryPath(cacheKey), 'artifacts')
+        artifactPath = os.path.join(artifactsPath, fileType)
+
+        # The output file name is only ever different to the save base path by its suffix, such as ".4326.png"
+        if os.path.isdir(artifactPath) or not all(savedPath.startswith(saveBasePath) for savedPath in savedPaths):
+            return
+
+        # Files are copied into a staging directory which is renamed into place, so a partly stored file type is never used
+        stagingPath = os.path.join(artifactsPath, '.%s.%s' % (fileType, uuid.uuid4().hex[:8]))
+        os.makedirs(stagingPath)
+
+        for savedPath in savedPaths:
+            shutil.copyfile(savedPath, os.path.join(stagingPath, self.ARTIFACT_PREFIX + savedPath[len(saveBasePath):]))
+
+        try:
+            os.rename(stagingPath, artifactPath)
+        except OSError:
+            # Another worker stored the same file type first
+            shutil.rmtree(stagingPath, ignore_errors = True)
+
+    def storeResponse(self, cacheKey, url, responseContent):
+        entryPath = self.__entryPath(cacheKey)
+        os.makedirs(os.path.join(entryPath, 'artifacts'), exist_ok = True)
+
+        self.__writeFile(os.path.join(entryPath, 'meta.json'), json.dumps({'created': time.time(), 'url': url}))
+        self.__writeFile(os.path.join(entryPath, 'response.json'), responseContent)
+
+    def __directorySize(self, path):
+        sizeBytes = 0
+
+        for directoryPath, directoryNames, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    sizeBytes += os.path.getsize(os.path.join(directoryPath, filename))
+                except FileNotFoundError:
+                    pass
+
+        return sizeBytes
+
+    def __entryPath(self, cacheKey):
+        # Entries are spread over sub directories so that no single directory becomes too large
+        return os.path.join(self.directory, cacheKey[:2], cacheKey)
+
+    def __entryPaths(self):
+        for prefix in os.listdir(self.directory):
+            prefixPath = os.path.join(self.directory, prefix)
+
+            if os.path.isdir(prefixPath):
+                for cacheKey in os.listdir(prefixPath):
+                    yield os.path.join(prefixPath, cacheKey)
+
+    def __isExpired(self, meta):
+        return self.ttlSeconds > 0 and time.time() - meta['created'] > self.ttlSeconds
+
+    def __writeFile(self, path, content):
+        temporaryPath = '%s.%s.part' % (path, uuid.uuid4().hex[:8])
+
+        # Responses are kept as the bytes which were received
+        with open(temporaryPath, 'wb' if isinstance(content, bytes) else 'w') as outputFile:
+            outputFile.write(content)
+
+        os.replace(temporaryPath, path)
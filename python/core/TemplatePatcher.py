@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Applies the values of a CSV row to a JSON template, using headers given in dot notation such as "transmitter.lat"
+#
+# Each header is split into its path through the template once, when the patcher is created, rather than again for every row.
+# Only the objects and lists along the path of a header are copied for each row, everything else is shared with the template.
+# As such the template, and any JSON returned from apply(), must never be changed in place.
+class TemplatePatcher:
+    def __init__(self, templateJson, headers):
+        self.templateJson = templateJson
+        self.__plan = self.__compile(headers)
+
+    def apply(self, csvRowDictionary):
+        return self.__patch(self.templateJson, self.__plan, csvRowDictionary)
+
+    def __compile(self, headers):
+        # The plan is a tree with one branch for each key which is changed, in the form of {key: (header, plan)}
+        plan = {}
+
+        for header in headers:
+            parts = str(header).split('.')
+            node = plan
+            templateValue = self.templateJson
+
+            for depth, part in enumerate(parts):
+                key = part
+
+                if isinstance(templateValue, list):
+                    # Lists are indexed by number, for example "transmitters.0.lat"
+                    try:
+                        key = int(part)
+                        templateValue[key]
+                    except (IndexError, ValueError):
+                        raise ValueError('The "%s" header does not match an item of the "%s" list in the template.' % (header, '.'.join(parts[:depth])))
+                elif templateValue is not None and not isinstance(templateValue, dict):
+                    raise ValueError('The "%s" header can not be set as "%s" is not an object in the template.' % (header, '.'.join(parts[:depth])))
+
+                isLeaf = depth == len(parts) - 1
+                existingHeader, childPlan = node.get(key, (None, None))
+
+                if existingHeader is not None or (isLeaf and childPlan is not None):
+                    raise ValueError('The "%s" header overlaps with the "%s" header.' % (header, existingHeader or '.'.join(parts[:depth + 1]) + '.*'))
+
+                if isLeaf:
+                    node[key] = (header, None)
+                else:
+                    if childPlan is None:
+                        childPlan = {}
+                        node[key] = (None, childPlan)
+
+                    node = childPlan
+
+                    if isinstance(templateValue, (dict, list)):
+                        templateValue = templateValue[key] if isinstance(templateValue, list) else templateValue.get(key)
+
+        return plan
+
+    def __patch(self, templateValue, plan, csvRowDictionary):
+        # Keys which are missing from the template are created as new objects
+        if isinstance(templateValue, list):
+            patchedValue = list(templateValue)
+        elif isinstance(templateValue, dict):
+            patchedValue = dict(templateValue)
+        else:
+            patchedValue = {}
+
+        for key, (header, childPlan) in plan.items():
+            if header is not None:
+                patchedValue[key] = csvRowDictionary[header]
+            else:
+                childValue = patchedValue[key] if isinstance(patchedValue, list) else patchedValue.get(key)
+                patchedValue[key] = self.__patch(childValue, childPlan, csvRowDictionary)
+
+        return patchedValue
@@ -0,0 +1,53 @@
+"""Unit tests for core.BatchJournal"""
+import os
+import tempfile
+import unittest
+
+from core.BatchJournal import BatchJournal
+
+
+class TestBatchJournal(unittest.TestCase):
+    """Call with python -m unittest test_BatchJournal from the python directory"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'journal.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_after_cut_off_line(self):
+        """An event appended after a crash cut the last line short must survive the next load"""
+        journal = BatchJournal(self.path)
+        journal.recordCalculated('a', 1, 'row-a', '/tmp/a', {'sid': 'A'})
+
+        with open(self.path, 'ab') as journalFile:
+            journalFile.write(b'{"event": "calculated", "hash": "x", "ro')
+
+        resumedJournal = BatchJournal(self.path)
+        self.assertEqual(resumedJournal.get('a')['sid'], 'A')
+        self.assertIsNone(resumedJournal.get('x'))
+        resumedJournal.recordCalculated('b', 2, 'row-b', '/tmp/b', {'sid': 'B'})
+
+        reloadedJournal = BatchJournal(self.path)
+        self.assertEqual(reloadedJournal.get('a')['sid'], 'A')
+        self.assertEqual(reloadedJournal.get('b')['sid'], 'B')
+
+    def test_record_missing_only_its_newline_is_kept(self):
+        """A record which was written in full but without its newline is kept, and the next event starts on a new line"""
+        journal = BatchJournal(self.path)
+        journal.recordCalculated('a', 1, 'row-a', '/tmp/a', {'sid': 'A'})
+
+        with open(self.path, 'rb+') as journalFile:
+            journalFile.truncate(os.path.getsize(self.path) - 1)
+
+        resumedJournal = BatchJournal(self.path)
+        resumedJournal.recordCalculated('b', 2, 'row-b', '/tmp/b', {'sid': 'B'})
+
+        reloadedJournal = BatchJournal(self.path)
+        self.assertEqual(reloadedJournal.get('a')['sid'], 'A')
+        self.assertEqual(reloadedJournal.get('b')['sid'], 'B')
+
+
+if __name__ == '__main__':
+    unittest.main()